@@ -7,8 +7,20 @@ class Camera:
         self.camera_rect = pygame.Rect(0, 0, screen_w, screen_h)
 
     def apply(self, entity):
-        return entity.rect.move(-self.camera_rect.x, -self.camera_rect.y)
+        return self.apply_rect(entity.rect)
+
+    def apply_rect(self, rect):
+        return rect.move(-self.camera_rect.x, -self.camera_rect.y)
+
+    def visible(self, entities):
+        view = self.camera_rect
+        for e in entities:
+            if view.colliderect(e.rect):
+                yield e
 
     def update(self, target):
-        self.camera_rect.x = target.rect.centerx - self.screen_w // 2
-        self.camera_rect.y = target.rect.centery - self.screen_h // 2
+        self.follow(target.rect)
+
+    def follow(self, rect):
+        self.camera_rect.x = rect.centerx - self.screen_w // 2
+        self.camera_rect.y = rect.centery - self.screen_h // 2
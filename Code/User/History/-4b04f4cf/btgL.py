@@ -1,8 +1,10 @@
-import random
 import sys
 
 import pygame
 
+from snake_core import DOWN, LEFT, RIGHT, UP, SetSnake
+from snake_draw import BackgroundCache, TextCache
+
 pygame.init()
 
 WIDTH, HEIGHT = 640, 480
@@ -11,30 +13,54 @@ GRID = 20
 window = pygame.display.set_mode((WIDTH, HEIGHT))
 clock = pygame.time.Clock()
 font = pygame.font.Font(None, 34)
+DIRTY_RECTS = True
 
 
-def random_position():
-    cols = WIDTH // GRID
-    rows = HEIGHT // GRID
-    return random.randint(0, cols - 1) * GRID, random.randint(0, rows - 1) * GRID
+background = BackgroundCache(lambda surface: surface.fill((0, 0, 0)))
 
 
-snake_body = [(300, 240), (280, 240), (260, 240)]
+text_cache = TextCache()
 
-move_x, move_y = GRID, 0
-food_pos = random_position()
-points = 0
-alive = True
-running = True
 
+def cell_rect(cell):
+    return pygame.Rect(cell[0] * GRID, cell[1] * GRID, GRID, GRID)
+
+
+def score_rect():
+    return pygame.Rect((10, 10), font.size(f"Score: {state.score}"))
+
+
+def paint(area):
+    area = area.clip(window.get_rect())
+    window.set_clip(area)
+    background.draw(window, area)
+
+    for x in range(area.left // GRID, (area.right - 1) // GRID + 1):
+        for y in range(area.top // GRID, (area.bottom - 1) // GRID + 1):
+            if state.occupied((x, y)):
+                pygame.draw.rect(window, (0, 200, 0), cell_rect((x, y)))
+
+    if area.colliderect(cell_rect(state.food)):
+        pygame.draw.rect(window, (200, 30, 30), cell_rect(state.food))
+
+    if area.colliderect(score_rect()):
+        score_surf = text_cache.render(font, f"Score: {state.score}", (255, 255, 255))
+        window.blit(score_surf, (10, 10))
+
+    if not state.alive:
+        msg = text_cache.render(
+            font, "Game Over: Enter - restart, Esc - quit", (255, 255, 255)
+        )
+        window.blit(
+            msg, ((WIDTH - msg.get_width()) // 2, (HEIGHT - msg.get_height()) // 2)
+        )
 
-def reset_game():
-    global snake_body, move_x, move_y, food_pos, points, alive
-    snake_body = [(300, 240), (280, 240), (260, 240)]
-    move_x, move_y = GRID, 0
-    food_pos = random_position()
-    points = 0
-    alive = True
+    window.set_clip(None)
+
+
+state = SetSnake(WIDTH // GRID, HEIGHT // GRID)
+running = True
+dirty = [window.get_rect()]
 
 
 while running:
@@ -43,63 +69,41 @@ while running:
             running = False
 
         if event.type == pygame.KEYDOWN:
-            if alive:
-                if event.key == pygame.K_UP and move_y == 0:
-                    move_x, move_y = 0, -GRID
-                elif event.key == pygame.K_DOWN and move_y == 0:
-                    move_x, move_y = 0, GRID
-                elif event.key == pygame.K_LEFT and move_x == 0:
-                    move_x, move_y = -GRID, 0
-                elif event.key == pygame.K_RIGHT and move_x == 0:
-                    move_x, move_y = GRID, 0
+            if state.alive:
+                if event.key == pygame.K_UP:
+                    state.turn(UP)
+                elif event.key == pygame.K_DOWN:
+                    state.turn(DOWN)
+                elif event.key == pygame.K_LEFT:
+                    state.turn(LEFT)
+                elif event.key == pygame.K_RIGHT:
+                    state.turn(RIGHT)
             else:
                 if event.key == pygame.K_RETURN:
-                    reset_game()
+                    state.reset()
+                    dirty.append(window.get_rect())
                 elif event.key == pygame.K_ESCAPE:
                     running = False
 
-    if alive:
-        head_x, head_y = snake_body[0]
-        new_head = (head_x + move_x, head_y + move_y)
-
-        if (
-            new_head[0] < 0
-            or new_head[0] >= WIDTH
-            or new_head[1] < 0
-            or new_head[1] >= HEIGHT
-            or new_head in snake_body
-        ):
-            alive = False
-        else:
-            snake_body.insert(0, new_head)
-            if new_head == food_pos:
-                points += 1
-                while True:
-                    food_pos = random_position()
-                    if food_pos not in snake_body:
-                        break
+    if state.alive:
+        old_score = score_rect()
+        if state.step():
+            dirty.append(cell_rect(state.body[0]))
+            if state.ate:
+                dirty.append(cell_rect(state.food))
+                dirty.append(old_score.union(score_rect()))
             else:
-                snake_body.pop()
-
-    window.fill((0, 0, 0))
-
-    for px, py in snake_body:
-        pygame.draw.rect(window, (0, 200, 0), (px, py, GRID, GRID))
-
-    pygame.draw.rect(window, (200, 30, 30), (*food_pos, GRID, GRID))
-
-    score_surf = font.render(f"Score: {points}", True, (255, 255, 255))
-    window.blit(score_surf, (10, 10))
+                dirty.append(cell_rect(state.tail))
+        else:
+            dirty.append(window.get_rect())
 
-    if not alive:
-        msg = font.render(
-            "Game Over: Enter - restart, Esc - quit", True, (255, 255, 255)
-        )
-        window.blit(
-            msg, ((WIDTH - msg.get_width()) // 2, (HEIGHT - msg.get_height()) // 2)
-        )
+    if not DIRTY_RECTS:
+        dirty = [window.get_rect()]
 
-    pygame.display.update()
+    for rect in dirty:
+        paint(rect)
+    pygame.display.update(dirty)
+    dirty = []
     clock.tick(10)
 
 pygame.quit()
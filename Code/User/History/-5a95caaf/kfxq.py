@@ -1,8 +1,10 @@
-import random
 import sys
 
 import pygame
 
+from snake_core import DOWN, LEFT, RIGHT, UP, SetSnake
+from snake_draw import BackgroundCache, TextCache
+
 pygame.init()
 
 CELL = 20
@@ -11,45 +13,84 @@ screen = pygame.display.set_mode((W, H))
 clock = pygame.time.Clock()
 font_big = pygame.font.Font(None, 60)
 font_small = pygame.font.Font(None, 34)
+DIRTY_RECTS = True
 
 
-def rand_cell():
-    return (
-        random.randrange(0, W // CELL) * CELL,
-        random.randrange(0, H // CELL) * CELL,
-    )
-
+def draw_gradient(surface):
+    w, h = surface.get_size()
+    for i in range(h):
+        c = 35 + int(40 * (i / h))
+        pygame.draw.line(surface, (c, c, c + 20), (0, i), (w, i))
 
-def draw_gradient():
-    for i in range(H):
-        c = 35 + int(40 * (i / H))
-        pygame.draw.line(screen, (c, c, c + 20), (0, i), (W, i))
 
+background = BackgroundCache(draw_gradient)
 
-snake = [(W // 2, H // 2), (W // 2 - CELL, H // 2), (W // 2 - 2 * CELL, H // 2)]
 
-dirx, diry = 1, 0
-food = rand_cell()
-score = 0
+state = SetSnake(W // CELL, H // CELL)
 record = 0
 running = True
-game_over = False
+dirty = [screen.get_rect()]
+
+
+text_cache = TextCache()
 
 
 def draw_text(text, x, y):
-    shadow = font_small.render(text, True, (0, 0, 0))
+    shadow = text_cache.render(font_small, text, (0, 0, 0))
     screen.blit(shadow, (x + 2, y + 2))
-    surf = font_small.render(text, True, (255, 255, 255))
+    surf = text_cache.render(font_small, text, (255, 255, 255))
     screen.blit(surf, (x, y))
 
 
-def reset():
-    global snake, dirx, diry, food, score, game_over
-    snake = [(W // 2, H // 2), (W // 2 - CELL, H // 2), (W // 2 - 2 * CELL, H // 2)]
-    dirx, diry = 1, 0
-    food = rand_cell()
-    score = 0
-    game_over = False
+def text_rect(text, x, y):
+    w, h = font_small.size(text)
+    return pygame.Rect(x, y, w + 2, h + 2)
+
+
+def cell_rect(cell):
+    return pygame.Rect(cell[0] * CELL, cell[1] * CELL, CELL, CELL)
+
+
+def food_rect(cell):
+    return cell_rect(cell).inflate(8, 8)
+
+
+def paint(area):
+    area = area.clip(screen.get_rect())
+    screen.set_clip(area)
+    background.draw(screen, area)
+
+    # ---- Draw snake ----
+    for x in range(area.left // CELL, (area.right - 1) // CELL + 1):
+        for y in range(area.top // CELL, (area.bottom - 1) // CELL + 1):
+            if state.occupied((x, y)):
+                pygame.draw.rect(
+                    screen,
+                    (0, 200, 0),
+                    cell_rect((x, y)).inflate(-4, -4),
+                    border_radius=6,
+                )
+
+    if area.colliderect(food_rect(state.food)):
+        # ---- Food glow ----
+        pygame.draw.ellipse(screen, (255, 80, 80), food_rect(state.food))
+
+        # ---- Food ----
+        pygame.draw.rect(screen, (255, 40, 40), cell_rect(state.food), border_radius=4)
+
+    if area.colliderect(text_rect(f"Score: {state.score}", 10, 10)):
+        draw_text(f"Score: {state.score}", 10, 10)
+    if area.colliderect(text_rect(f"Record: {record}", 10, 40)):
+        draw_text(f"Record: {record}", 10, 40)
+
+    if not state.alive:
+        t = text_cache.render(font_big, "GAME OVER", (255, 255, 255))
+        screen.blit(t, ((W - t.get_width()) // 2, 150))
+
+        t2 = text_cache.render(font_small, "Enter - Restart   Esc - Quit", (255, 255, 255))
+        screen.blit(t2, ((W - t2.get_width()) // 2, 230))
+
+    screen.set_clip(None)
 
 
 while running:
@@ -57,68 +98,45 @@ while running:
         if e.type == pygame.QUIT:
             running = False
 
-        if e.type == pygame.KEYDOWN and not game_over:
-            if e.key == pygame.K_UP and diry == 0:
-                dirx, diry = 0, -1
-            elif e.key == pygame.K_DOWN and diry == 0:
-                dirx, diry = 0, 1
-            elif e.key == pygame.K_LEFT and dirx == 0:
-                dirx, diry = -1, 0
-            elif e.key == pygame.K_RIGHT and dirx == 0:
-                dirx, diry = 1, 0
-
-        if e.type == pygame.KEYDOWN and game_over:
+        if e.type == pygame.KEYDOWN and state.alive:
+            if e.key == pygame.K_UP:
+                state.turn(UP)
+            elif e.key == pygame.K_DOWN:
+                state.turn(DOWN)
+            elif e.key == pygame.K_LEFT:
+                state.turn(LEFT)
+            elif e.key == pygame.K_RIGHT:
+                state.turn(RIGHT)
+
+        elif e.type == pygame.KEYDOWN:
             if e.key == pygame.K_RETURN:
-                reset()
+                state.reset()
+                dirty.append(screen.get_rect())
             elif e.key == pygame.K_ESCAPE:
                 running = False
 
-    if not game_over:
-        head = (snake[0][0] + dirx * CELL, snake[0][1] + diry * CELL)
-
-        if head[0] < 0 or head[0] >= W or head[1] < 0 or head[1] >= H or head in snake:
-            game_over = True
-            record = max(record, score)
-        else:
-            snake.insert(0, head)
-            if head == food:
-                score += 1
-                while True:
-                    food = rand_cell()
-                    if food not in snake:
-                        break
+    if state.alive:
+        old_score = text_rect(f"Score: {state.score}", 10, 10)
+        if state.step():
+            dirty.append(cell_rect(state.body[0]))
+            if state.ate:
+                # The head sits where the old food was.
+                dirty.append(food_rect(state.body[0]))
+                dirty.append(food_rect(state.food))
+                dirty.append(old_score.union(text_rect(f"Score: {state.score}", 10, 10)))
             else:
-                snake.pop()
-
-    draw_gradient()
-
-    # ---- Draw snake ----
-    for s in snake:
-        pygame.draw.rect(
-            screen,
-            (0, 200, 0),
-            (s[0] + 2, s[1] + 2, CELL - 4, CELL - 4),
-            border_radius=6,
-        )
-
-    # ---- Food glow ----
-    glow = pygame.Rect(food[0] - 4, food[1] - 4, CELL + 8, CELL + 8)
-    pygame.draw.ellipse(screen, (255, 80, 80), glow)
-
-    # ---- Food ----
-    pygame.draw.rect(screen, (255, 40, 40), (*food, CELL, CELL), border_radius=4)
-
-    draw_text(f"Score: {score}", 10, 10)
-    draw_text(f"Record: {record}", 10, 40)
-
-    if game_over:
-        t = font_big.render("GAME OVER", True, (255, 255, 255))
-        screen.blit(t, ((W - t.get_width()) // 2, 150))
+                dirty.append(cell_rect(state.tail))
+        else:
+            record = max(record, state.score)
+            dirty.append(screen.get_rect())
 
-        t2 = font_small.render("Enter - Restart   Esc - Quit", True, (255, 255, 255))
-        screen.blit(t2, ((W - t2.get_width()) // 2, 230))
+    if not DIRTY_RECTS:
+        dirty = [screen.get_rect()]
 
-    pygame.display.flip()
+    for rect in dirty:
+        paint(rect)
+    pygame.display.update(dirty)
+    dirty = []
     clock.tick(10)
 
 pygame.quit()
@@ -0,0 +1,25 @@
+import pygame
+
+class AssetCache:
+    def __init__(self):
+        self.frames = {}
+        self.atlases = []
+
+    def load(self, paths, size):
+        missing = [p for p in dict.fromkeys(paths) if (p, size) not in self.frames]
+        if missing:
+            w, h = size
+            atlas = pygame.Surface((w * len(missing), h), pygame.SRCALPHA).convert_alpha()
+            for i, path in enumerate(missing):
+                image = pygame.transform.scale(pygame.image.load(path).convert_alpha(), size)
+                # MAX against the transparent atlas copies pixels as-is instead of
+                # alpha-blending them onto black.
+                atlas.blit(image, (i * w, 0), special_flags=pygame.BLEND_RGBA_MAX)
+                self.frames[(path, size)] = atlas.subsurface((i * w, 0, w, h))
+            self.atlases.append(atlas)
+        return [self.frames[(p, size)] for p in paths]
+
+    def frame(self, path, size):
+        return self.load([path], size)[0]
+
+assets = AssetCache()
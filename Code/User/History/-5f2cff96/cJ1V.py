@@ -1,32 +1,64 @@
+import math
 import pygame
 from pygame import Rect
+from atlas import assets
 
 GRAVITY = 1500
 JUMP_SPEED = -600
 MOVE_SPEED = 220
 WIDTH, HEIGHT = 40, 40
+FRAMES = [
+    'assets/pig_stay.png',
+    'assets/pig_left_1.png',
+    'assets/pig_left_2.png',
+    'assets/pig_right_1.png',
+    'assets/pig_right_2.png',
+    'assets/pig_jump_left.png',
+    'assets/pig_jump_right.png',
+]
+
+def sweep(x, y, w, h, dx, dy, r):
+    # Time of impact of the box (x, y, w, h) moving by (dx, dy) against r, as
+    # (t, axis) with axis 0 for a vertical hit and 1 for a horizontal one.
+    # Boxes that only touch along the direction of motion do not collide.
+    if dx > 0:
+        tx_entry, tx_exit = (r.left - (x + w)) / dx, (r.right - x) / dx
+    elif dx < 0:
+        tx_entry, tx_exit = (r.right - x) / dx, (r.left - (x + w)) / dx
+    elif x + w > r.left and x < r.right:
+        tx_entry, tx_exit = float('-inf'), float('inf')
+    else:
+        return None
+    if dy > 0:
+        ty_entry, ty_exit = (r.top - (y + h)) / dy, (r.bottom - y) / dy
+    elif dy < 0:
+        ty_entry, ty_exit = (r.bottom - y) / dy, (r.top - (y + h)) / dy
+    elif y + h > r.top and y < r.bottom:
+        ty_entry, ty_exit = float('-inf'), float('inf')
+    else:
+        return None
+    entry = max(tx_entry, ty_entry)
+    if entry < 0 or entry > 1 or entry >= min(tx_exit, ty_exit):
+        return None
+    # Landing wins a corner tie so the pig does not snag on tile seams.
+    return entry, 0 if ty_entry >= tx_entry else 1
 
 class Player(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
 
-        self.stay = pygame.transform.scale(pygame.image.load('assets/pig_stay.png').convert_alpha(), (WIDTH, HEIGHT))
-
-        self.run_left = [
-            pygame.transform.scale(pygame.image.load('assets/pig_left_1.png').convert_alpha(), (WIDTH, HEIGHT)),
-            pygame.transform.scale(pygame.image.load('assets/pig_left_2.png').convert_alpha(), (WIDTH, HEIGHT))
-        ]
-
-        self.run_right = [
-            pygame.transform.scale(pygame.image.load('assets/pig_right_1.png').convert_alpha(), (WIDTH, HEIGHT)),
-            pygame.transform.scale(pygame.image.load('assets/pig_right_2.png').convert_alpha(), (WIDTH, HEIGHT))
-        ]
-
-        self.jump_left = pygame.transform.scale(pygame.image.load('assets/pig_jump_left.png').convert_alpha(), (WIDTH, HEIGHT))
-        self.jump_right = pygame.transform.scale(pygame.image.load('assets/pig_jump_right.png').convert_alpha(), (WIDTH, HEIGHT))
+        (self.stay,
+         left_1, left_2,
+         right_1, right_2,
+         self.jump_left, self.jump_right) = assets.load(FRAMES, (WIDTH, HEIGHT))
+        self.run_left = [left_1, left_2]
+        self.run_right = [right_1, right_2]
 
         self.image = self.stay
         self.rect = Rect(x, y, WIDTH, HEIGHT)
+        # Sub-pixel position; rect is this rounded down.
+        self.x = float(x)
+        self.y = float(y)
 
         self.vx = 0
         self.vy = 0
@@ -36,24 +68,67 @@ class Player(pygame.sprite.Sprite):
         self.anim_frame = 0
         self.facing_right = True
 
-    def collide(self, dx, dy, platforms):
-        for p in platforms:
-            if self.rect.colliderect(p.rect):
-                if dx > 0:
-                    self.rect.right = p.rect.left
-                    self.vx = 0
-                if dx < 0:
-                    self.rect.left = p.rect.right
-                    self.vx = 0
+    def push_out(self, x, y, w, h, grid):
+        # Sweeps only see faces ahead of the box, so a box that starts inside
+        # a tile (the level changed under it) is first moved out along the
+        # shallowest axis.
+        for _ in range(4):
+            inside = None
+            for r in grid.query(Rect(math.floor(x), math.floor(y), w + 1, h + 1)):
+                if x < r.right and x + w > r.left and y < r.bottom and y + h > r.top:
+                    inside = r
+                    break
+            if inside is None:
+                break
+            r = inside
+            x, y = min(
+                (x + w - r.left, r.left - w, y),
+                (r.right - x, r.right, y),
+                (y + h - r.top, x, r.top - h),
+                (r.bottom - y, x, r.bottom),
+            )[1:]
+        return x, y
+
+    def collide(self, dx, dy, grid):
+        w, h = self.rect.size
+        x, y = self.push_out(self.x, self.y, w, h, grid)
+        self.on_ground = False
+        # One sweep per axis at most: the first hit stops that axis and the
+        # rest of the move slides along the other one.
+        for _ in range(2):
+            if not dx and not dy:
+                break
+            broad = Rect(int(min(x, x + dx)) - 1, int(min(y, y + dy)) - 1,
+                         int(abs(dx)) + w + 3, int(abs(dy)) + h + 3)
+            hit = None
+            for r in grid.query(broad):
+                toi = sweep(x, y, w, h, dx, dy, r)
+                if toi is not None and (hit is None or toi[:2] < hit[:2]):
+                    hit = toi + (r,)
+            if hit is None:
+                x += dx
+                y += dy
+                break
+            t, axis, r = hit
+            x += dx * t
+            y += dy * t
+            if axis == 0:
+                y = r.top - h if dy > 0 else r.bottom
                 if dy > 0:
-                    self.rect.bottom = p.rect.top
-                    self.vy = 0
                     self.on_ground = True
-                if dy < 0:
-                    self.rect.top = p.rect.bottom
-                    self.vy = 0
-
-    def update(self, left, right, up, platforms, dt):
+                self.vy = 0
+                dx *= 1 - t
+                dy = 0
+            else:
+                x = r.left - w if dx > 0 else r.right
+                self.vx = 0
+                dy *= 1 - t
+                dx = 0
+        self.x = x
+        self.y = y
+        self.rect.topleft = (math.floor(x), math.floor(y))
+
+    def update(self, left, right, up, grid, dt):
         target = 0
         if left:
             target = -1
@@ -73,13 +148,7 @@ class Player(pygame.sprite.Sprite):
 
         self.vy += GRAVITY * dt
 
-        dy = self.vy * dt
-        self.rect.y += dy
-        self.collide(0, dy, platforms)
-
-        dx = self.vx * dt
-        self.rect.x += dx
-        self.collide(dx, 0, platforms)
+        self.collide(self.vx * dt, self.vy * dt, grid)
 
         if not self.on_ground:
             self.image = self.jump_right if self.facing_right else self.jump_left
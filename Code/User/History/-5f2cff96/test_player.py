@@ -0,0 +1,129 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+import pygame
+from pygame import Rect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+spec = importlib.util.spec_from_file_location("player", os.path.join(HERE, "cJ1V.py"))
+player = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(player)
+
+from atlas import assets
+
+# The pig frames are not needed for collision; seed the cache so Player()
+# does not go looking for the image files.
+for path in player.FRAMES:
+    assets.frames[(path, (player.WIDTH, player.HEIGHT))] = pygame.Surface((player.WIDTH, player.HEIGHT))
+
+DT = 1 / 120
+TILE = 32
+
+
+class Tiles:
+    # Brute-force stand-in for TileGrid.query.
+    def __init__(self, *rects):
+        self.rects = [Rect(r) for r in rects]
+
+    def query(self, rect):
+        return [r for r in self.rects if r.colliderect(rect)]
+
+
+class SweepTest(unittest.TestCase):
+    def test_fast_fall_hits_tile(self):
+        # A 1000 px step would skip a 32 px tile entirely without the sweep.
+        t, axis = player.sweep(0, 0, 40, 40, 0, 1000, Rect(0, 500, TILE, TILE))
+        self.assertAlmostEqual(t, 0.46)
+        self.assertEqual(axis, 0)
+
+    def test_miss_and_touch(self):
+        self.assertIsNone(player.sweep(0, 0, 40, 40, 0, 1000, Rect(100, 500, TILE, TILE)))
+        # Sliding along a face is not a hit.
+        self.assertIsNone(player.sweep(0, 60, 40, 40, 100, 0, Rect(0, 100, 200, TILE)))
+
+    def test_corner_tie_lands(self):
+        t, axis = player.sweep(0, 0, 40, 40, 10, 10, Rect(50, 50, TILE, TILE))
+        self.assertEqual(axis, 0)
+
+
+class CollideTest(unittest.TestCase):
+    def run_player(self, p, tiles, steps, left=False, right=False, up=False, dt=DT):
+        for _ in range(steps):
+            p.update(left, right, up, tiles, dt)
+            up = False
+
+    def test_fast_fall_lands(self):
+        tiles = Tiles((0, 1000, 200, TILE))
+        p = player.Player(50, 0)
+        p.vy = 200000
+        self.run_player(p, tiles, 1)
+        self.assertEqual(p.y, 1000 - player.HEIGHT)
+        self.assertTrue(p.on_ground)
+        self.assertEqual(p.vy, 0)
+
+    def test_walk_speed(self):
+        tiles = Tiles((0, 100, 2000, TILE))
+        p = player.Player(50, 60)
+        self.run_player(p, tiles, 120, right=True)
+        self.assertAlmostEqual(p.x - 50, player.MOVE_SPEED, places=6)
+        self.assertEqual(p.y, 60)
+        self.assertTrue(p.on_ground)
+
+    def test_large_dt_walk_stops_at_wall(self):
+        tiles = Tiles((0, 100, 2000, TILE), (300, 0, TILE, 100))
+        p = player.Player(200, 60)
+        self.run_player(p, tiles, 1, right=True, dt=1.0)
+        self.assertEqual(p.x, 300 - player.WIDTH)
+        self.assertEqual(p.vx, 0)
+
+    def test_ceiling_stops_jump(self):
+        tiles = Tiles((0, 100, 2000, TILE), (0, 0, 2000, 20))
+        p = player.Player(50, 60)
+        self.run_player(p, tiles, 5)
+        self.run_player(p, tiles, 1, up=True)
+        top = p.y
+        for _ in range(30):
+            self.run_player(p, tiles, 1)
+            top = min(top, p.y)
+        self.assertEqual(top, 20)
+        self.run_player(p, tiles, 120)
+        self.assertEqual(p.y, 60)
+        self.assertTrue(p.on_ground)
+
+    def test_no_snag_on_chunk_seams(self):
+        # Chunks merge runs separately, so a floor is split at chunk edges
+        # and a stack of tiles can end in two rects meeting at one row.
+        tiles = Tiles((0, 100, 512, TILE), (512, 100, 512, TILE),
+                      (600, 0, TILE, 68), (600, 68, TILE, 32))
+        p = player.Player(400, 60)
+        for _ in range(60):
+            self.run_player(p, tiles, 1, right=True)
+            self.assertEqual(p.y, 60)
+            self.assertTrue(p.on_ground)
+        self.assertAlmostEqual(p.x, 400 + player.MOVE_SPEED / 2, places=6)
+        self.run_player(p, tiles, 60, right=True)
+        self.assertEqual(p.x, 600 - player.WIDTH)
+
+    def test_push_out_of_tile_after_level_change(self):
+        # A new level can put a tile where the pig stands; it must come out
+        # on top rather than fall through.
+        tiles = Tiles((0, 70, 2000, TILE))
+        p = player.Player(200, 60)
+        self.run_player(p, tiles, 1)
+        self.assertEqual(p.y, 70 - player.HEIGHT)
+        self.assertTrue(p.on_ground)
+        self.run_player(p, tiles, 60)
+        self.assertEqual(p.y, 70 - player.HEIGHT)
+
+    def test_push_out_sideways(self):
+        tiles = Tiles((100, 0, TILE, 200))
+        p = player.Player(120, 50)
+        self.assertEqual(p.push_out(p.x, p.y, player.WIDTH, player.HEIGHT, tiles), (132, 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
-import random
 import sys
 
 import pygame
 
+from snake_core import DOWN, LEFT, RIGHT, UP, SetSnake
+from snake_draw import BackgroundCache, TextCache
+
 pygame.init()
 
 WIDTH, HEIGHT = 640, 480
@@ -12,38 +14,83 @@ window = pygame.display.set_mode((WIDTH, HEIGHT))
 clock = pygame.time.Clock()
 font_big = pygame.font.Font(None, 60)
 font_small = pygame.font.Font(None, 34)
+DIRTY_RECTS = True
 
 
-def random_cell():
-    return (
-        random.randrange(0, WIDTH // GRID) * GRID,
-        random.randrange(0, HEIGHT // GRID) * GRID,
-    )
-
+state = SetSnake(WIDTH // GRID, HEIGHT // GRID)
 
-snake = [(300, 240), (280, 240), (260, 240)]
-dx, dy = GRID, 0
-food = random_cell()
-
-score = 0
 record = 0
-alive = True
 running = True
+dirty = [window.get_rect()]
+
+
+def draw_gradient(surface):
+    w, h = surface.get_size()
+    for i in range(h):
+        c = 40 + int(40 * (i / h))
+        pygame.draw.line(surface, (c, c, c + 20), (0, i), (w, i))
+
+
+background = BackgroundCache(draw_gradient)
+
+
+text_cache = TextCache()
+
+
+# Score + Record with shadow
+def draw_text(text, x, y):
+    shadow = text_cache.render(font_small, text, (0, 0, 0))
+    window.blit(shadow, (x + 2, y + 2))
+    surf = text_cache.render(font_small, text, (255, 255, 255))
+    window.blit(surf, (x, y))
+
+
+def text_rect(text, x, y):
+    w, h = font_small.size(text)
+    return pygame.Rect(x, y, w + 2, h + 2)
+
 
+def cell_rect(cell):
+    return pygame.Rect(cell[0] * GRID, cell[1] * GRID, GRID, GRID)
 
-def draw_gradient():
-    for i in range(HEIGHT):
-        c = 40 + int(40 * (i / HEIGHT))
-        pygame.draw.line(window, (c, c, c + 20), (0, i), (WIDTH, i))
 
+def glow_rect(cell):
+    return cell_rect(cell).inflate(8, 8)
 
-def reset():
-    global snake, dx, dy, food, score, alive
-    snake = [(300, 240), (280, 240), (260, 240)]
-    dx, dy = GRID, 0
-    food = random_cell()
-    score = 0
-    alive = True
+
+def paint(area):
+    area = area.clip(window.get_rect())
+    window.set_clip(area)
+    background.draw(window, area)
+
+    # Snake
+    for x in range(area.left // GRID, (area.right - 1) // GRID + 1):
+        for y in range(area.top // GRID, (area.bottom - 1) // GRID + 1):
+            if state.occupied((x, y)):
+                pygame.draw.rect(
+                    window, (0, 180, 0), cell_rect((x, y)).inflate(-4, -4), border_radius=6
+                )
+
+    if area.colliderect(glow_rect(state.food)):
+        # Food glow
+        pygame.draw.ellipse(window, (255, 80, 80, 20), glow_rect(state.food))
+
+        # Food
+        pygame.draw.rect(window, (255, 40, 40), cell_rect(state.food), border_radius=4)
+
+    if area.colliderect(text_rect(f"Score: {state.score}", 10, 10)):
+        draw_text(f"Score: {state.score}", 10, 10)
+    if area.colliderect(text_rect(f"Record: {record}", 10, 40)):
+        draw_text(f"Record: {record}", 10, 40)
+
+    if not state.alive:
+        txt = text_cache.render(font_big, "GAME OVER", (255, 255, 255))
+        window.blit(txt, ((WIDTH - txt.get_width()) // 2, 140))
+
+        tip = text_cache.render(font_small, "Enter - Restart   Esc - Quit", (255, 255, 255))
+        window.blit(tip, ((WIDTH - tip.get_width()) // 2, 220))
+
+    window.set_clip(None)
 
 
 while running:
@@ -52,79 +99,45 @@ while running:
             running = False
 
         if e.type == pygame.KEYDOWN:
-            if alive:
-                if e.key == pygame.K_UP and dy == 0:
-                    dx, dy = 0, -GRID
-                elif e.key == pygame.K_DOWN and dy == 0:
-                    dx, dy = 0, GRID
-                elif e.key == pygame.K_LEFT and dx == 0:
-                    dx, dy = -GRID, 0
-                elif e.key == pygame.K_RIGHT and dx == 0:
-                    dx, dy = GRID, 0
+            if state.alive:
+                if e.key == pygame.K_UP:
+                    state.turn(UP)
+                elif e.key == pygame.K_DOWN:
+                    state.turn(DOWN)
+                elif e.key == pygame.K_LEFT:
+                    state.turn(LEFT)
+                elif e.key == pygame.K_RIGHT:
+                    state.turn(RIGHT)
             else:
                 if e.key == pygame.K_RETURN:
-                    reset()
+                    state.reset()
+                    dirty.append(window.get_rect())
                 elif e.key == pygame.K_ESCAPE:
                     running = False
 
-    if alive:
-        head_x, head_y = snake[0]
-        new_head = (head_x + dx, head_y + dy)
-
-        if (
-            new_head[0] < 0
-            or new_head[0] >= WIDTH
-            or new_head[1] < 0
-            or new_head[1] >= HEIGHT
-            or new_head in snake
-        ):
-            alive = False
-            record = max(record, score)
-        else:
-            snake.insert(0, new_head)
-            if new_head == food:
-                score += 1
-                while True:
-                    food = random_cell()
-                    if food not in snake:
-                        break
+    if state.alive:
+        old_score = text_rect(f"Score: {state.score}", 10, 10)
+        if state.step():
+            dirty.append(cell_rect(state.body[0]))
+            if state.ate:
+                # The head sits where the old food was.
+                dirty.append(glow_rect(state.body[0]))
+                dirty.append(glow_rect(state.food))
+                dirty.append(old_score.union(text_rect(f"Score: {state.score}", 10, 10)))
             else:
-                snake.pop()
+                dirty.append(cell_rect(state.tail))
+        else:
+            record = max(record, state.score)
+            dirty.append(window.get_rect())
 
     # === DRAW ===
-    draw_gradient()
-
-    # Snake
-    for x, y in snake:
-        pygame.draw.rect(
-            window, (0, 180, 0), (x + 2, y + 2, GRID - 4, GRID - 4), border_radius=6
-        )
-
-    # Food glow
-    glow_rect = pygame.Rect(food[0] - 4, food[1] - 4, GRID + 8, GRID + 8)
-    pygame.draw.ellipse(window, (255, 80, 80, 20), glow_rect)
-
-    # Food
-    pygame.draw.rect(window, (255, 40, 40), (*food, GRID, GRID), border_radius=4)
-
-    # Score + Record with shadow
-    def draw_text(text, x, y):
-        shadow = font_small.render(text, True, (0, 0, 0))
-        window.blit(shadow, (x + 2, y + 2))
-        surf = font_small.render(text, True, (255, 255, 255))
-        window.blit(surf, (x, y))
-
-    draw_text(f"Score: {score}", 10, 10)
-    draw_text(f"Record: {record}", 10, 40)
-
-    if not alive:
-        txt = font_big.render("GAME OVER", True, (255, 255, 255))
-        window.blit(txt, ((WIDTH - txt.get_width()) // 2, 140))
-
-        tip = font_small.render("Enter - Restart   Esc - Quit", True, (255, 255, 255))
-        window.blit(tip, ((WIDTH - tip.get_width()) // 2, 220))
+    if not DIRTY_RECTS:
+        dirty = [window.get_rect()]
 
-    pygame.display.update()
+    for rect in dirty:
+        paint(rect)
+    pygame.display.update(dirty)
+    dirty = []
     clock.tick(10)
 
 pygame.quit()
@@ -0,0 +1,237 @@
+import mmap
+import os
+import random
+import struct
+import sys
+
+import pygame
+from blocks import GROUND, cell_range
+
+# Binary level: header, then one tile byte per cell in row-major order.
+# Chunk sources all hand out rows of tile bytes like these, 0 for empty.
+MAGIC = b'PIGL'
+HEADER = struct.Struct('<4sHHII')
+TILE_CHARS = bytes.maketrans(bytes([0, GROUND]), b' -')
+# Text levels only know ground; any other character is empty, as it always was.
+CHAR_TILES = bytes(GROUND if c == ord('-') else 0 for c in range(256))
+# Chunk directories record the chunk size they were cut with in this file.
+CHUNK_SIZE_FILE = 'size.txt'
+CHUNK_COLS, CHUNK_ROWS = 16, 16
+
+def tile_bytes(row):
+    # One byte per character, so columns stay put even for non-ASCII text.
+    return row.encode('ascii', 'replace').translate(CHAR_TILES)
+
+def tile_rows(level_map):
+    return [tile_bytes(row) for row in level_map]
+
+def merge_runs(rows, tile_w, tile_h, x0=0, y0=0):
+    rects = []
+    open_runs = {}
+    for y, row in enumerate(rows):
+        runs = {}
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            r = open_runs.get((start, x))
+            if r is not None:
+                r.height += tile_h
+            else:
+                r = pygame.Rect(x0 + start * tile_w, y0 + y * tile_h, (x - start) * tile_w, tile_h)
+                rects.append(r)
+            runs[(start, x)] = r
+        open_runs = runs
+    return rects
+
+class MapChunks:
+    def __init__(self, level_map, chunk_cols, chunk_rows):
+        self.rows = tile_rows(level_map)
+        self.chunk_cols = chunk_cols
+        self.chunk_rows = chunk_rows
+
+    def chunk(self, cx, cy):
+        if cx < 0 or cy < 0:
+            return None
+        x0 = cx * self.chunk_cols
+        y0 = cy * self.chunk_rows
+        rows = [row[x0:x0 + self.chunk_cols] for row in self.rows[y0:y0 + self.chunk_rows]]
+        if not any(any(row) for row in rows):
+            return None
+        return rows
+
+class DiskChunks:
+    def __init__(self, path, chunk_cols, chunk_rows):
+        try:
+            with open(os.path.join(path, CHUNK_SIZE_FILE)) as f:
+                cols, rows = (int(n) for n in f.read().split())
+        except (FileNotFoundError, ValueError):
+            raise ValueError(f'{path}: not a chunk directory written by levels.py') from None
+        if (cols, rows) != (chunk_cols, chunk_rows):
+            raise ValueError(f'{path}: chunks are {cols}x{rows} tiles, '
+                             f'expected {chunk_cols}x{chunk_rows}')
+        self.path = path
+        self.chunk_cols = chunk_cols
+        self.chunk_rows = chunk_rows
+
+    def chunk(self, cx, cy):
+        name = os.path.join(self.path, f'{cx}_{cy}.txt')
+        try:
+            with open(name) as f:
+                rows = tile_rows(f.read().splitlines())
+        except FileNotFoundError:
+            return None
+        if len(rows) > self.chunk_rows or any(len(row) > self.chunk_cols for row in rows):
+            raise ValueError(f'{name}: larger than a {self.chunk_cols}x{self.chunk_rows} chunk')
+        return rows
+
+class BinaryLevel:
+    def __init__(self, path, chunk_cols, chunk_rows):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f'{path}: not a Super Pig level')
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.cols, self.rows = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != 1:
+            raise ValueError(f'{path}: not a Super Pig level')
+        if len(self.map) < HEADER.size + self.cols * self.rows:
+            raise ValueError(f'{path}: truncated, header says {self.cols}x{self.rows} tiles '
+                             f'but the file holds {len(self.map) - HEADER.size}')
+        self.chunk_cols = chunk_cols
+        self.chunk_rows = chunk_rows
+        self.tiles = memoryview(self.map)[HEADER.size:HEADER.size + self.cols * self.rows]
+
+    def chunk(self, cx, cy):
+        x0 = cx * self.chunk_cols
+        y0 = cy * self.chunk_rows
+        if cx < 0 or cy < 0 or x0 >= self.cols or y0 >= self.rows:
+            return None
+        x1 = min(x0 + self.chunk_cols, self.cols)
+        # Rows are views straight into the mapped file, nothing is copied.
+        rows = []
+        for y in range(y0, min(y0 + self.chunk_rows, self.rows)):
+            start = y * self.cols
+            rows.append(self.tiles[start + x0:start + x1])
+        if not any(any(row) for row in rows):
+            return None
+        return rows
+
+def save_binary(level_map, path):
+    cols = max(len(row) for row in level_map)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 1, 0, cols, len(level_map)))
+        for row in level_map:
+            f.write(tile_bytes(row.ljust(cols)))
+
+def level_source(level, chunk_cols, chunk_rows):
+    if isinstance(level, str):
+        if os.path.isdir(level):
+            return DiskChunks(level, chunk_cols, chunk_rows)
+        return BinaryLevel(level, chunk_cols, chunk_rows)
+    return MapChunks(level, chunk_cols, chunk_rows)
+
+def save_chunks(level_map, path, chunk_cols, chunk_rows):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, CHUNK_SIZE_FILE), 'w') as f:
+        f.write(f'{chunk_cols} {chunk_rows}\n')
+    source = MapChunks(level_map, chunk_cols, chunk_rows)
+    width = max(len(row) for row in level_map)
+    for cy in range(-(-len(level_map) // chunk_rows)):
+        for cx in range(-(-width // chunk_cols)):
+            rows = source.chunk(cx, cy)
+            if rows is not None:
+                with open(os.path.join(path, f'{cx}_{cy}.txt'), 'w') as f:
+                    f.write(''.join(row.translate(TILE_CHARS).decode('ascii') + '\n' for row in rows))
+
+def generate_level(cols, rows=10, seed=0):
+    rng = random.Random(seed)
+    grid = [[' '] * cols for _ in range(rows)]
+    for x in range(cols):
+        if x % 40 < 37:
+            grid[rows - 1][x] = '-'
+    for _ in range(cols // 4):
+        y = rng.randrange(2, rows - 2)
+        x = rng.randrange(cols)
+        for i in range(rng.randrange(2, 8)):
+            if x + i < cols:
+                grid[y][x + i] = '-'
+    return [''.join(row) for row in grid]
+
+class ChunkStreamer:
+    def __init__(self, pool, grid, layer, tile_w, tile_h, chunk_cols, chunk_rows):
+        self.pool = pool
+        self.grid = grid
+        self.layer = layer
+        self.tile_w = tile_w
+        self.tile_h = tile_h
+        self.chunk_w = chunk_cols * tile_w
+        self.chunk_h = chunk_rows * tile_h
+        self.source = None
+        self.loaded = {}
+
+    def load_level(self, source):
+        self.clear()
+        self.source = source
+
+    def clear(self):
+        for key in list(self.loaded):
+            self.unload(key)
+
+    def update(self, view):
+        # Load one chunk beyond the view, keep up to two so that walking back
+        # and forth over a chunk edge does not thrash.
+        load_area = view.inflate(self.chunk_w * 2, self.chunk_h * 2)
+        keep_area = view.inflate(self.chunk_w * 4, self.chunk_h * 4)
+        for key in cell_range(load_area, self.chunk_w, self.chunk_h):
+            if key not in self.loaded:
+                self.load(key)
+        for key in list(self.loaded):
+            cx, cy = key
+            if not keep_area.colliderect((cx * self.chunk_w, cy * self.chunk_h, self.chunk_w, self.chunk_h)):
+                self.unload(key)
+
+    def load(self, key):
+        cx, cy = key
+        rows = self.source.chunk(cx, cy)
+        platforms = []
+        rects = []
+        if rows:
+            x0 = cx * self.chunk_w
+            y0 = cy * self.chunk_h
+            for y, row in enumerate(rows):
+                for x, tile in enumerate(row):
+                    if tile:
+                        p = self.pool.get(x0 + x * self.tile_w, y0 + y * self.tile_h, tile)
+                        if self.layer is not None:
+                            self.layer.add(p)
+                        platforms.append(p)
+            rects = merge_runs(rows, self.tile_w, self.tile_h, x0, y0)
+            for r in rects:
+                self.grid.add(r)
+        self.loaded[key] = (platforms, rects)
+
+    def platforms(self):
+        for platforms, _ in self.loaded.values():
+            yield from platforms
+
+    def unload(self, key):
+        platforms, rects = self.loaded.pop(key)
+        for p in platforms:
+            self.pool.put(p)
+        for r in rects:
+            self.grid.remove(r)
+        if self.layer is not None:
+            self.layer.discard(key)
+
+if __name__ == '__main__':
+    # python levels.py OUT COLS  -- write a generated level, as a binary
+    # level if OUT ends in .pig, otherwise as a directory of chunk files
+    level_map = generate_level(int(sys.argv[2]))
+    if sys.argv[1].endswith('.pig'):
+        save_binary(level_map, sys.argv[1])
+    else:
+        save_chunks(level_map, sys.argv[1], CHUNK_COLS, CHUNK_ROWS)
@@ -0,0 +1,99 @@
+import json
+import time
+from collections import deque
+
+import pygame
+
+# Trace events are written in Chrome's JSON array format. Its closing
+# bracket is optional, so a trace cut short by a crash still loads.
+TRACE_BATCH = 512
+
+class FrameProfiler:
+    def __init__(self, history=240, trace_path=None):
+        self.history = history
+        self.samples = {}
+        self.trace = None
+        self.pending = []
+        if trace_path is not None:
+            self.trace = open(trace_path, 'w')
+            self.trace.write('[')
+            self.separator = '\n'
+        self.show = False
+        self.font = None
+        self.overlay = None
+        self.overlay_at = 0.0
+        self.origin = time.perf_counter()
+        self.frame_start = self.last = self.origin
+
+    def begin_frame(self):
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, name):
+        # Close the phase that ran since the previous mark.
+        now = time.perf_counter()
+        self.record(name, self.last, now)
+        self.last = now
+
+    def end_frame(self):
+        self.record('frame', self.frame_start, self.last)
+
+    def record(self, name, start, end):
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.history)
+        self.samples[name].append((end - start) * 1000)
+        if self.trace is not None:
+            self.pending.append(json.dumps({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self.origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': 1,
+                'tid': 1,
+            }))
+            if len(self.pending) >= TRACE_BATCH:
+                self.flush()
+
+    def percentiles(self, name):
+        values = sorted(self.samples[name])
+        last = len(values) - 1
+        return [values[round(last * q)] for q in (0.5, 0.95, 0.99)]
+
+    def draw(self, surface):
+        if not self.show or not self.samples:
+            return
+        now = time.perf_counter()
+        if self.overlay is None or now - self.overlay_at > 0.25:
+            self.overlay = self.render_overlay()
+            self.overlay_at = now
+        surface.blit(self.overlay, (8, 8))
+
+    def render_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        lines = ['phase      p50    p95    p99 ms']
+        for name in self.samples:
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f'{name:8} {p50:6.2f} {p95:6.2f} {p99:6.2f}')
+        line_h = self.font.get_linesize()
+        overlay = pygame.Surface((230, line_h * len(lines) + 8), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 160))
+        for i, line in enumerate(lines):
+            overlay.blit(self.font.render(line, True, (255, 255, 255)), (4, 4 + i * line_h))
+        return overlay
+
+    def flush(self):
+        if self.trace is None or not self.pending:
+            return
+        for event in self.pending:
+            self.trace.write(self.separator + event)
+            self.separator = ',\n'
+        self.trace.flush()
+        self.pending.clear()
+
+    def close(self):
+        if self.trace is None:
+            return
+        self.flush()
+        self.trace.write('\n]\n')
+        self.trace.close()
+        self.trace = None
@@ -0,0 +1,78 @@
+import argparse
+import os
+import struct
+import time
+
+# Replay log: header, then one record per rendered frame holding the frame
+# time and the inputs read during that frame.
+MAGIC = b'PIGR'
+HEADER = struct.Struct('<4sHHI')
+FRAME = struct.Struct('<dB')
+MAX_SWITCHES = 31
+
+def pack_flags(left, right, up, switches):
+    return bool(left) | bool(right) << 1 | bool(up) << 2 | min(switches, MAX_SWITCHES) << 3
+
+def unpack_flags(flags):
+    return bool(flags & 1), bool(flags & 2), bool(flags & 4), flags >> 3
+
+class Recorder:
+    def __init__(self, path, level_index, physics_hz=0):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, 1, level_index, physics_hz))
+
+    def write(self, dt, left, right, up, switches):
+        self.file.write(FRAME.pack(dt, pack_flags(left, right, up, switches)))
+
+    def close(self):
+        self.file.close()
+
+def read_log(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, level_index, physics_hz = HEADER.unpack_from(data)
+    if magic != MAGIC or version != 1:
+        raise ValueError(f'{path}: not a Super Pig replay')
+    frames = [(dt, *unpack_flags(flags)) for dt, flags in FRAME.iter_unpack(data[HEADER.size:])]
+    return level_index, physics_hz, frames
+
+def replay(path, render=False):
+    # main opens the window on import, so pick the driver first.
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import main
+
+    level_index, physics_hz, frames = read_log(path)
+    if physics_hz and physics_hz != main.PHYSICS_HZ:
+        print(f'warning: recorded at {physics_hz} Hz physics, replaying at {main.PHYSICS_HZ} Hz')
+    world = main.World(main.LEVELS, level_index)
+    up = False
+    start = time.perf_counter()
+    for dt, left, right, pressed_up, switches in frames:
+        world.tick(dt)
+        for _ in range(switches):
+            world.next_level()
+        up = up or pressed_up
+        world.stream()
+        up = world.physics(left, right, up)
+        world.follow()
+        if render:
+            world.draw(main.SCREEN)
+    elapsed = time.perf_counter() - start
+    return world, len(frames), elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a Super Pig input log headless')
+    parser.add_argument('log', help='file written by main.py --record')
+    parser.add_argument('levels', nargs='*', help='the extra levels the log was recorded with')
+    parser.add_argument('--render', action='store_true', help='also draw every frame off screen')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import main
+    main.add_levels(parser, args.levels)
+    world, frames, elapsed = replay(args.log, args.render)
+    p = world.player
+    steps = world.steps
+    print(f'{frames} frames, {steps} physics steps in {elapsed:.3f}s '
+          f'({frames / elapsed:.0f} frames/s, {steps / elapsed:.0f} steps/s)')
+    print(f'level {world.level_index}: x={p.x:.3f} y={p.y:.3f} vx={p.vx:.1f} vy={p.vy:.1f} on_ground={p.on_ground}')
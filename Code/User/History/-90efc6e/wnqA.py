@@ -1,16 +1,30 @@
+import argparse
+import math
 import pygame
 from player import Player
-from blocks import Platform
+from blocks import TileGrid, LevelLayer, PlatformPool
 from camera import Camera
+from levels import CHUNK_COLS, CHUNK_ROWS, ChunkStreamer, level_source
+from profiler import FrameProfiler
+from replay import Recorder
 
 pygame.init()
 WIDTH, HEIGHT = 800, 600
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+VSYNC = False
+if VSYNC:
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+else:
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption('Super Pig')
 CLOCK = pygame.time.Clock()
-FPS = 60
+FPS = 60  # render cap, 0 for uncapped
+PHYSICS_HZ = 120
+PHYSICS_DT = 1 / PHYSICS_HZ
+MAX_FRAME_DT = 0.25
 PLATFORM_W = 32
 PLATFORM_H = 32
+STATIC_LAYER = True
+CHUNK_W, CHUNK_H = CHUNK_COLS * PLATFORM_W, CHUNK_ROWS * PLATFORM_H
 
 LEVELS = [
     [
@@ -54,59 +68,142 @@ LEVELS = [
 
 LEVEL_INDEX = 0
 
-def build_level(level_map, group, platforms):
-    for y, row in enumerate(level_map):
-        for x, ch in enumerate(row):
-            if ch == '-':
-                px = x * PLATFORM_W
-                py = y * PLATFORM_H
-                p = Platform(px, py, PLATFORM_W, PLATFORM_H)
-                group.add(p)
-                platforms.append(p)
-
-def main():
-    global LEVEL_INDEX
+def add_levels(parser, paths):
+    # Open every level once up front so a bad path fails here rather than
+    # when the player presses n.
+    for path in paths:
+        try:
+            level_source(path, CHUNK_COLS, CHUNK_ROWS)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    LEVELS.extend(paths)
+
+class World:
+    def __init__(self, levels, level_index=0):
+        self.levels = levels
+        self.level_index = level_index
+        self.entities = pygame.sprite.Group()
+        self.grid = TileGrid(PLATFORM_W * 4, PLATFORM_H * 4)
+        self.layer = LevelLayer(CHUNK_W, CHUNK_H) if STATIC_LAYER else None
+        self.pool = PlatformPool(PLATFORM_W, PLATFORM_H)
+        self.streamer = ChunkStreamer(self.pool, self.grid, self.layer,
+                                      PLATFORM_W, PLATFORM_H, CHUNK_COLS, CHUNK_ROWS)
+        self.streamer.load_level(level_source(levels[level_index], CHUNK_COLS, CHUNK_ROWS))
+        self.player = Player(50, 50)
+        self.entities.add(self.player)
+        self.camera = Camera(WIDTH, HEIGHT)
+        self.camera.update(self.player)
+        self.prev_pos = (self.player.x, self.player.y)
+        self.player_rect = self.player.rect.copy()
+        self.accumulator = 0.0
+        self.steps = 0
+
+    def next_level(self):
+        self.level_index = (self.level_index + 1) % len(self.levels)
+        self.streamer.load_level(level_source(self.levels[self.level_index], CHUNK_COLS, CHUNK_ROWS))
+
+    def tick(self, frame_dt):
+        # Clamp long hitches so physics never has to catch up on seconds of
+        # backlog at once.
+        self.accumulator += min(frame_dt, MAX_FRAME_DT)
+
+    def stream(self):
+        self.streamer.update(self.camera.camera_rect)
+
+    def physics(self, left, right, up):
+        # Returns whether a jump press is still waiting for a physics step.
+        while self.accumulator >= PHYSICS_DT:
+            self.prev_pos = (self.player.x, self.player.y)
+            self.player.update(left, right, up, self.grid, PHYSICS_DT)
+            up = False
+            self.accumulator -= PHYSICS_DT
+            self.steps += 1
+        return up
+
+    def follow(self):
+        alpha = self.accumulator / PHYSICS_DT
+        px, py = self.prev_pos
+        self.player_rect = self.player.rect.copy()
+        # Floor like Player.collide does, so a resting pig is drawn where its
+        # collision box is.
+        self.player_rect.x = math.floor(px + (self.player.x - px) * alpha)
+        self.player_rect.y = math.floor(py + (self.player.y - py) * alpha)
+        self.camera.follow(self.player_rect)
+
+    def draw(self, surface):
+        surface.fill((135, 206, 235))
+        if self.layer is not None:
+            self.layer.draw(surface, self.camera.camera_rect)
+        else:
+            for p in self.camera.visible(self.streamer.platforms()):
+                surface.blit(p.image, self.camera.apply(p))
+        for e in self.camera.visible(self.entities):
+            if e is self.player:
+                surface.blit(e.image, self.camera.apply_rect(self.player_rect))
+            else:
+                surface.blit(e.image, self.camera.apply(e))
+
+def main(trace_path=None, record_path=None):
     running = True
-    entities = pygame.sprite.Group()
-    platforms = []
-    player = Player(50, 50)
-    entities.add(player)
-    build_level(LEVELS[LEVEL_INDEX], entities, platforms)
-    camera = Camera(WIDTH, HEIGHT)
+    world = World(LEVELS, LEVEL_INDEX)
+    up = False
+    prof = FrameProfiler(trace_path=trace_path)
+    recorder = Recorder(record_path, LEVEL_INDEX, PHYSICS_HZ) if record_path is not None else None
 
     while running:
-        dt = CLOCK.tick(FPS) / 1000
-        up = False
+        prof.begin_frame()
+        frame_dt = CLOCK.tick(FPS) / 1000
+        world.tick(frame_dt)
+        prof.mark('wait')
 
+        pressed_up = False
+        pressed_n = 0
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
+                if event.key == pygame.K_F3:
+                    prof.show = not prof.show
                 if event.key in (pygame.K_UP, pygame.K_SPACE):
-                    up = True
+                    pressed_up = True
                 if event.key == pygame.K_n:
-                    for s in list(entities):
-                        if isinstance(s, Platform):
-                            entities.remove(s)
-                    platforms.clear()
-                    LEVEL_INDEX = (LEVEL_INDEX + 1) % len(LEVELS)
-                    build_level(LEVELS[LEVEL_INDEX], entities, platforms)
+                    pressed_n += 1
+                    world.next_level()
 
         keys = pygame.key.get_pressed()
         left = keys[pygame.K_LEFT]
         right = keys[pygame.K_RIGHT]
+        up = up or pressed_up
+        if recorder is not None:
+            recorder.write(frame_dt, left, right, pressed_up, pressed_n)
+        prof.mark('events')
 
-        player.update(left, right, up, platforms, dt)
-        camera.update(player)
+        world.stream()
+        prof.mark('stream')
+        up = world.physics(left, right, up)
+        prof.mark('physics')
+        world.follow()
+        prof.mark('camera')
 
-        SCREEN.fill((135, 206, 235))
-        for e in entities:
-            SCREEN.blit(e.image, camera.apply(e))
+        world.draw(SCREEN)
+        prof.draw(SCREEN)
+        prof.mark('draw')
         pygame.display.flip()
+        prof.mark('flip')
+        prof.end_frame()
 
+    if recorder is not None:
+        recorder.close()
+    prof.close()
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Super Pig')
+    parser.add_argument('levels', nargs='*', help='.pig files or chunk directories written by levels.py')
+    parser.add_argument('--trace', metavar='PATH', help='write per-frame timings as Chrome trace JSON')
+    parser.add_argument('--record', metavar='PATH', help='record per-frame input for replay.py')
+    args = parser.parse_args()
+    add_levels(parser, args.levels)
+    main(args.trace, args.record)
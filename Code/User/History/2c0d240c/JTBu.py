@@ -1,8 +1,10 @@
-import random
 import sys
 
 import pygame
 
+from snake_core import DOWN, LEFT, RIGHT, UP, SetSnake
+from snake_draw import BackgroundCache, TextCache
+
 pygame.init()
 
 CELL_SIZE = 20
@@ -11,95 +13,43 @@ WINDOW_WIDTH, WINDOW_HEIGHT = 640, 480
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 clock = pygame.time.Clock()
 font = pygame.font.SysFont(None, 36)
+DIRTY_RECTS = True
 
 
-def get_random_cell():
-    return (
-        random.randrange(0, WINDOW_WIDTH // CELL_SIZE) * CELL_SIZE,
-        random.randrange(0, WINDOW_HEIGHT // CELL_SIZE) * CELL_SIZE,
-    )
+background = BackgroundCache(lambda surface: surface.fill((0, 0, 0)))
 
 
-snake = [
-    (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2),
-    (WINDOW_WIDTH // 2 - CELL_SIZE, WINDOW_HEIGHT // 2),
-    (WINDOW_WIDTH // 2 - 2 * CELL_SIZE, WINDOW_HEIGHT // 2),
-]
+text_cache = TextCache()
 
-direction_x, direction_y = 1, 0
-food = get_random_cell()
-score = 0
-running = True
-game_over = False
 
+def cell_rect(cell):
+    return pygame.Rect(cell[0] * CELL_SIZE, cell[1] * CELL_SIZE, CELL_SIZE, CELL_SIZE)
 
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
 
-        if event.type == pygame.KEYDOWN and not game_over:
-            if event.key == pygame.K_UP and direction_y == 0:
-                direction_x, direction_y = 0, -1
-            elif event.key == pygame.K_DOWN and direction_y == 0:
-                direction_x, direction_y = 0, 1
-            elif event.key == pygame.K_LEFT and direction_x == 0:
-                direction_x, direction_y = -1, 0
-            elif event.key == pygame.K_RIGHT and direction_x == 0:
-                direction_x, direction_y = 1, 0
-
-        if event.type == pygame.KEYDOWN and game_over:
-            if event.key == pygame.K_RETURN:
-                snake = [
-                    (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2),
-                    (WINDOW_WIDTH // 2 - CELL_SIZE, WINDOW_HEIGHT // 2),
-                    (WINDOW_WIDTH // 2 - 2 * CELL_SIZE, WINDOW_HEIGHT // 2),
-                ]
-                direction_x, direction_y = 1, 0
-                food = get_random_cell()
-                score = 0
-                game_over = False
-            elif event.key == pygame.K_ESCAPE:
-                running = False
+def score_rect():
+    return pygame.Rect((10, 10), font.size(f"Score: {state.score}"))
 
-    if not game_over:
-        head_x = snake[0][0] + direction_x * CELL_SIZE
-        head_y = snake[0][1] + direction_y * CELL_SIZE
-        new_head = (head_x, head_y)
-
-        if (
-            head_x < 0
-            or head_x >= WINDOW_WIDTH
-            or head_y < 0
-            or head_y >= WINDOW_HEIGHT
-            or new_head in snake
-        ):
-            game_over = True
-        else:
-            snake.insert(0, new_head)
-
-            if new_head == food:
-                score += 1
-                while True:
-                    food = get_random_cell()
-                    if food not in snake:
-                        break
-            else:
-                snake.pop()
 
-    screen.fill((0, 0, 0))
+def paint(area):
+    area = area.clip(screen.get_rect())
+    screen.set_clip(area)
+    background.draw(screen, area)
 
-    for cell in snake:
-        pygame.draw.rect(screen, (0, 255, 0), (*cell, CELL_SIZE, CELL_SIZE))
+    for x in range(area.left // CELL_SIZE, (area.right - 1) // CELL_SIZE + 1):
+        for y in range(area.top // CELL_SIZE, (area.bottom - 1) // CELL_SIZE + 1):
+            if state.occupied((x, y)):
+                pygame.draw.rect(screen, (0, 255, 0), cell_rect((x, y)))
 
-    pygame.draw.rect(screen, (255, 0, 0), (*food, CELL_SIZE, CELL_SIZE))
+    if area.colliderect(cell_rect(state.food)):
+        pygame.draw.rect(screen, (255, 0, 0), cell_rect(state.food))
 
-    score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-    screen.blit(score_text, (10, 10))
+    if area.colliderect(score_rect()):
+        score_text = text_cache.render(font, f"Score: {state.score}", (255, 255, 255))
+        screen.blit(score_text, (10, 10))
 
-    if game_over:
-        game_over_text = font.render(
-            "Game Over - Enter to restart or Esc to quit", True, (255, 255, 255)
+    if not state.alive:
+        game_over_text = text_cache.render(
+            font, "Game Over - Enter to restart or Esc to quit", (255, 255, 255)
         )
         screen.blit(
             game_over_text,
@@ -109,7 +59,55 @@ while running:
             ),
         )
 
-    pygame.display.flip()
+    screen.set_clip(None)
+
+
+state = SetSnake(WINDOW_WIDTH // CELL_SIZE, WINDOW_HEIGHT // CELL_SIZE)
+running = True
+dirty = [screen.get_rect()]
+
+
+while running:
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+
+        if event.type == pygame.KEYDOWN and state.alive:
+            if event.key == pygame.K_UP:
+                state.turn(UP)
+            elif event.key == pygame.K_DOWN:
+                state.turn(DOWN)
+            elif event.key == pygame.K_LEFT:
+                state.turn(LEFT)
+            elif event.key == pygame.K_RIGHT:
+                state.turn(RIGHT)
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RETURN:
+                state.reset()
+                dirty.append(screen.get_rect())
+            elif event.key == pygame.K_ESCAPE:
+                running = False
+
+    if state.alive:
+        old_score = score_rect()
+        if state.step():
+            dirty.append(cell_rect(state.body[0]))
+            if state.ate:
+                dirty.append(cell_rect(state.food))
+                dirty.append(old_score.union(score_rect()))
+            else:
+                dirty.append(cell_rect(state.tail))
+        else:
+            dirty.append(screen.get_rect())
+
+    if not DIRTY_RECTS:
+        dirty = [screen.get_rect()]
+
+    for rect in dirty:
+        paint(rect)
+    pygame.display.update(dirty)
+    dirty = []
     clock.tick(10)
 
 pygame.quit()
@@ -0,0 +1,116 @@
+import numpy as np
+
+from snake_core import COLS, DOWN, LEFT, RIGHT, ROWS, UP
+
+# Direction indices used for the action arrays: 0 up, 1 down, 2 left, 3 right.
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DX = np.array([d[0] for d in DIRECTIONS])
+DY = np.array([d[1] for d in DIRECTIONS])
+EMPTY = np.iinfo(np.int32).min // 2
+
+
+class BatchSnake:
+    """N independent games advanced in lockstep.
+
+    Instead of storing bodies, every cell remembers the tick at which a head
+    last entered it. A cell belongs to the body while it was entered within
+    the last `length` ticks, so moving is one write and growing is just
+    `length += 1`.
+    """
+
+    def __init__(self, n, cols=COLS, rows=ROWS, seed=None):
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        self.games = np.arange(n)
+        self.entered = np.empty((n, rows, cols), dtype=np.int32)
+        self.tick = np.zeros(n, dtype=np.int32)
+        self.length = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.head_x = np.zeros(n, dtype=np.int32)
+        self.head_y = np.zeros(n, dtype=np.int32)
+        self.food_x = np.zeros(n, dtype=np.int32)
+        self.food_y = np.zeros(n, dtype=np.int32)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.reset(self.games)
+
+    def reset(self, games):
+        x, y = self.cols // 2, self.rows // 2
+        self.entered[games] = EMPTY
+        self.entered[games, y, x - 2] = -2
+        self.entered[games, y, x - 1] = -1
+        self.entered[games, y, x] = 0
+        self.tick[games] = 0
+        self.length[games] = 3
+        self.score[games] = 0
+        self.head_x[games] = x
+        self.head_y[games] = y
+        self.direction[games] = DIRECTIONS.index(RIGHT)
+        self.place_food(games)
+
+    def occupied(self, games=None):
+        if games is None:
+            games = self.games
+        since = (self.tick[games] - self.length[games])[:, None, None]
+        return self.entered[games] > since
+
+    def place_food(self, games):
+        if len(games) == 0:
+            return
+        # Try one random cell per game first; it is free most of the time.
+        xs = self.rng.integers(0, self.cols, len(games))
+        ys = self.rng.integers(0, self.rows, len(games))
+        self.food_x[games] = xs
+        self.food_y[games] = ys
+        since = self.tick[games] - self.length[games]
+        games = games[self.entered[games, ys, xs] > since]
+        if len(games) == 0:
+            return
+        # Otherwise give every free cell a uniform random key; argmax picks
+        # one free cell uniformly for the remaining games at once.
+        keys = self.rng.random((len(games), self.rows, self.cols))
+        keys[self.occupied(games)] = -1.0
+        flat = keys.reshape(len(games), -1).argmax(axis=1)
+        self.food_y[games], self.food_x[games] = np.divmod(flat, self.cols)
+
+    def turn(self, actions):
+        actions = np.asarray(actions)
+        wanted = actions >= 0
+        a = np.where(wanted, actions, 0)
+        d = self.direction
+        allowed = wanted & (DX[a] * DX[d] + DY[a] * DY[d] == 0)
+        self.direction = np.where(allowed, a, d).astype(np.int8)
+
+    def step(self, actions=None):
+        """Advance every game one tick.
+
+        `actions` holds one direction index per game, or -1 to keep going.
+        Returns boolean arrays (ate, done); finished games are reset.
+        """
+        if actions is not None:
+            self.turn(actions)
+
+        hx = self.head_x + DX[self.direction]
+        hy = self.head_y + DY[self.direction]
+        wall = (hx < 0) | (hx >= self.cols) | (hy < 0) | (hy >= self.rows)
+        cx = np.clip(hx, 0, self.cols - 1)
+        cy = np.clip(hy, 0, self.rows - 1)
+        # The tail still counts as occupied on the tick it would move away.
+        hit = self.entered[self.games, cy, cx] > self.tick - self.length
+        done = wall | hit
+        live = self.games[~done]
+
+        self.tick[live] += 1
+        self.entered[live, cy[live], cx[live]] = self.tick[live]
+        self.head_x[live] = cx[live]
+        self.head_y[live] = cy[live]
+
+        ate = ~done & (cx == self.food_x) & (cy == self.food_y)
+        self.length += ate
+        self.score += ate
+        full = ate & (self.length == self.rows * self.cols)
+        done |= full
+        self.place_food(self.games[ate & ~full])
+        self.reset(self.games[done])
+        return ate, done
@@ -0,0 +1,117 @@
+import argparse
+import random
+import time
+
+from snake_core import COLS, DOWN, LEFT, RIGHT, ROWS, UP, ListSnake, SetSnake
+
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+
+def random_policy(seed):
+    rng = random.Random(seed)
+
+    def policy(state):
+        if rng.random() < 0.2:
+            return rng.choice(DIRECTIONS)
+        return None
+
+    return policy
+
+
+def cycle_route(cols, rows):
+    # Hamiltonian cycle: snake along the rows from column 1 and come back up
+    # column 0. Following it never dies and eventually fills the board.
+    route = {}
+    for y in range(rows):
+        for x in range(1, cols):
+            if y % 2 == 0:
+                route[(x, y)] = RIGHT if x < cols - 1 else DOWN
+            else:
+                route[(x, y)] = LEFT if x > 1 else DOWN
+        route[(0, y)] = UP
+    route[(1, rows - 1)] = LEFT
+    route[(0, 0)] = RIGHT
+    return route
+
+
+def cycle_policy(cols, rows):
+    route = cycle_route(cols, rows)
+
+    def policy(state):
+        return route[state.body[0]]
+
+    return policy
+
+
+def cycle_table(cols, rows):
+    import numpy as np
+
+    table = np.zeros((rows, cols), dtype=np.int8)
+    for (x, y), direction in cycle_route(cols, rows).items():
+        table[y, x] = DIRECTIONS.index(direction)
+    return table
+
+
+def run_batch(n, policy, ticks, seed):
+    import numpy as np
+    from snake_batch import BatchSnake
+
+    batch = BatchSnake(n, COLS, ROWS, seed=seed)
+    rng = np.random.default_rng(seed)
+    table = cycle_table(COLS, ROWS)
+    games = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if policy == "random":
+            actions = rng.integers(-4, 4, n)
+        else:
+            actions = table[batch.head_y, batch.head_x]
+        _, done = batch.step(actions)
+        games += int(done.sum())
+    elapsed = time.perf_counter() - start
+    return elapsed, games
+
+
+def run(state, policy, ticks):
+    resets = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if not state.step(policy(state)):
+            state.reset()
+            resets += 1
+    elapsed = time.perf_counter() - start
+    return elapsed, resets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless snake benchmark")
+    parser.add_argument("--ticks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--batch", type=int, default=0, help="also run N games at once with NumPy"
+    )
+    args = parser.parse_args()
+
+    policies = {
+        "random": lambda: random_policy(args.seed),
+        "cycle": lambda: cycle_policy(COLS, ROWS),
+    }
+    for name, make_policy in policies.items():
+        for cls in (ListSnake, SetSnake):
+            state = cls(COLS, ROWS, seed=args.seed)
+            elapsed, resets = run(state, make_policy(), args.ticks)
+            print(
+                f"{cls.__name__:10} {name:7} {args.ticks / elapsed:12,.0f} steps/s"
+                f"  {elapsed:7.2f} s  {resets} games"
+            )
+        if args.batch:
+            ticks = max(1, args.ticks // args.batch)
+            elapsed, games = run_batch(args.batch, name, ticks, args.seed)
+            print(
+                f"{'Batch':10} {name:7} {args.batch * ticks / elapsed:12,.0f} steps/s"
+                f"  {elapsed:7.2f} s  {games} games"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import random
+from collections import deque
+
+COLS, ROWS = 32, 24
+
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+
+class FreeCells:
+    def __init__(self, cols, rows, occupied, rng):
+        self.rng = rng
+        self.cells = [
+            (x, y) for y in range(rows) for x in range(cols) if (x, y) not in occupied
+        ]
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, cell):
+        self.index[cell] = len(self.cells)
+        self.cells.append(cell)
+
+    def remove(self, cell):
+        i = self.index.pop(cell)
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[i] = last
+            self.index[last] = i
+
+    def choice(self):
+        return self.rng.choice(self.cells)
+
+
+class SetSnake:
+    def __init__(self, cols=COLS, rows=ROWS, seed=None):
+        self.cols = cols
+        self.rows = rows
+        self.rng = random.Random(seed)
+        self.free = None
+        self.reset()
+
+    def reset(self):
+        x, y = self.cols // 2, self.rows // 2
+        body = deque([(x, y), (x - 1, y), (x - 2, y)])
+        if self.free is None:
+            self.free = FreeCells(self.cols, self.rows, body, self.rng)
+        else:
+            # Hand the old body back instead of rebuilding the whole board.
+            for cell in self.body:
+                self.free.add(cell)
+            for cell in body:
+                self.free.remove(cell)
+        self.body = body
+        self.direction = RIGHT
+        self.food = self.free.choice()
+        self.score = 0
+        self.alive = True
+        self.ate = False
+        self.tail = None
+
+    def occupied(self, cell):
+        return cell not in self.free
+
+    def turn(self, direction):
+        if direction[0] * self.direction[0] + direction[1] * self.direction[1] == 0:
+            self.direction = direction
+
+    def step(self, direction=None):
+        if direction is not None:
+            self.turn(direction)
+        self.ate = False
+        self.tail = None
+        if not self.alive:
+            return False
+
+        x, y = self.body[0]
+        head = (x + self.direction[0], y + self.direction[1])
+
+        # Out-of-bounds cells are never in the free index, so this also
+        # covers hitting a wall.
+        if head not in self.free:
+            self.alive = False
+            return False
+
+        self.body.appendleft(head)
+        self.free.remove(head)
+        if head == self.food:
+            self.score += 1
+            self.ate = True
+            if self.free:
+                self.food = self.free.choice()
+            else:
+                self.alive = False
+        else:
+            self.tail = self.body.pop()
+            self.free.add(self.tail)
+        return self.alive
+
+
+class ListSnake:
+    def __init__(self, cols=COLS, rows=ROWS, seed=None):
+        self.cols = cols
+        self.rows = rows
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        x, y = self.cols // 2, self.rows // 2
+        self.body = [(x, y), (x - 1, y), (x - 2, y)]
+        self.direction = RIGHT
+        self.food = self.random_cell()
+        self.score = 0
+        self.alive = True
+        self.ate = False
+        self.tail = None
+
+    def random_cell(self):
+        return self.rng.randrange(self.cols), self.rng.randrange(self.rows)
+
+    def occupied(self, cell):
+        return cell in self.body
+
+    def turn(self, direction):
+        if direction[0] * self.direction[0] + direction[1] * self.direction[1] == 0:
+            self.direction = direction
+
+    def step(self, direction=None):
+        if direction is not None:
+            self.turn(direction)
+        self.ate = False
+        self.tail = None
+        if not self.alive:
+            return False
+
+        x, y = self.body[0]
+        head = (x + self.direction[0], y + self.direction[1])
+
+        if (
+            head[0] < 0
+            or head[0] >= self.cols
+            or head[1] < 0
+            or head[1] >= self.rows
+            or head in self.body
+        ):
+            self.alive = False
+            return False
+
+        self.body.insert(0, head)
+        if head == self.food:
+            self.score += 1
+            self.ate = True
+            if len(self.body) == self.cols * self.rows:
+                self.alive = False
+            else:
+                while True:
+                    self.food = self.random_cell()
+                    if self.food not in self.body:
+                        break
+        else:
+            self.tail = self.body.pop()
+        return self.alive
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class BackgroundCache:
+    """Renders a background once per window size; repaints blit from it."""
+
+    def __init__(self, render):
+        self.render = render
+        self.surface = None
+
+    def get(self, size):
+        if self.surface is None or self.surface.get_size() != size:
+            self.surface = pygame.Surface(size).convert()
+            self.render(self.surface)
+        return self.surface
+
+    def draw(self, target, area):
+        target.blit(self.get(target.get_size()), area, area)
+
+
+class TextCache:
+    """LRU of rendered text surfaces keyed on (font, text, colour)."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = font.render(text, True, color)
+            self.surfaces[key] = surf
+            if len(self.surfaces) > self.maxsize:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surf
@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from snake_bench import DIRECTIONS, cycle_policy
+from snake_core import SetSnake
+
+try:
+    import numpy as np
+    from snake_batch import BatchSnake
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "snake_batch needs NumPy")
+class BatchMatchesSetSnake(unittest.TestCase):
+    """Step BatchSnake next to one SetSnake per game and compare every tick.
+
+    The engines draw food from different generators, so each SetSnake is
+    handed the batch's food whenever a new piece is placed.
+    """
+
+    def shadow(self, batch, i):
+        game = SetSnake(batch.cols, batch.rows, seed=0)
+        game.food = (int(batch.food_x[i]), int(batch.food_y[i]))
+        return game
+
+    def check_invariants(self, batch):
+        occupied = batch.occupied()
+        np.testing.assert_array_equal(occupied.sum(axis=(1, 2)), batch.length)
+        self.assertTrue(occupied[batch.games, batch.head_y, batch.head_x].all())
+        self.assertFalse(occupied[batch.games, batch.food_y, batch.food_x].any())
+
+    def run_games(self, batch, choose, ticks):
+        games = [self.shadow(batch, i) for i in range(batch.n)]
+        eaten = deaths = full = 0
+        for _ in range(ticks):
+            actions = [choose(i, game) for i, game in enumerate(games)]
+            ate, done = batch.step(np.array(actions))
+            self.check_invariants(batch)
+            for i, game in enumerate(games):
+                alive = game.step(DIRECTIONS[actions[i]] if actions[i] >= 0 else None)
+                self.assertEqual(game.ate, bool(ate[i]))
+                self.assertEqual(not alive, bool(done[i]))
+                eaten += game.ate
+                if not alive:
+                    deaths += 1
+                    full += game.ate
+                    games[i] = self.shadow(batch, i)
+                    continue
+                if game.ate:
+                    game.food = (int(batch.food_x[i]), int(batch.food_y[i]))
+                cells = {(int(x), int(y)) for y, x in zip(*np.nonzero(batch.occupied(np.array([i]))[0]))}
+                self.assertEqual(cells, set(game.body))
+                self.assertEqual((int(batch.head_x[i]), int(batch.head_y[i])), game.body[0])
+        return eaten, deaths, full
+
+    def test_random_turns(self):
+        batch = BatchSnake(32, seed=3)
+        rng = random.Random(5)
+
+        def choose(i, game):
+            return rng.randrange(4) if rng.random() < 0.3 else -1
+
+        eaten, deaths, _ = self.run_games(batch, choose, 2000)
+        self.assertGreater(eaten, 0)
+        self.assertGreater(deaths, 0)
+
+    def test_cycle_fills_board(self):
+        # Following the Hamiltonian cycle on a small board eats every cell,
+        # which exercises growth right up to the full-board reset.
+        batch = BatchSnake(4, cols=6, rows=4, seed=3)
+        policy = cycle_policy(6, 4)
+
+        def choose(i, game):
+            return DIRECTIONS.index(policy(game))
+
+        _, _, full = self.run_games(batch, choose, 1500)
+        self.assertGreaterEqual(full, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,141 @@
 import pygame
 
-class Platform(pygame.sprite.Sprite):
-    def __init__(self, x, y, w, h):
-        super().__init__()
-        self.image = pygame.Surface((w, h))
-        self.image.fill((120, 72, 0))
-        pygame.draw.rect(self.image, (160, 110, 30), (2, 2, w - 4, h - 4))
-        self.rect = self.image.get_rect(topleft=(x, y))
+# Tile ids match the bytes of a binary level; 0 is empty.
+GROUND = 1
+
+def paint_ground(image):
+    w, h = image.get_size()
+    image.fill((120, 72, 0))
+    pygame.draw.rect(image, (160, 110, 30), (2, 2, w - 4, h - 4))
+
+class TileTypes:
+    # Each tile image is drawn once per (tile id, size) and shared by every
+    # platform using it.
+    def __init__(self):
+        self.painters = {}
+        self.images = {}
+
+    def register(self, tile, paint):
+        self.painters[tile] = paint
+        for key in [key for key in self.images if key[0] == tile]:
+            del self.images[key]
+
+    def image(self, tile, w, h):
+        key = (tile, w, h)
+        image = self.images.get(key)
+        if image is None:
+            paint = self.painters.get(tile)
+            if paint is None:
+                raise ValueError(f'no tile type registered for tile id {tile}')
+            image = pygame.Surface((w, h))
+            paint(image)
+            self.images[key] = image
+        return image
+
+tile_types = TileTypes()
+tile_types.register(GROUND, paint_ground)
+
+class Platform:
+    __slots__ = ('rect', 'tile')
+
+    def __init__(self, x, y, w, h, tile=GROUND):
+        self.rect = pygame.Rect(x, y, w, h)
+        self.tile = tile
+
+    @property
+    def image(self):
+        return tile_types.image(self.tile, self.rect.width, self.rect.height)
+
+class PlatformPool:
+    def __init__(self, w, h):
+        self.w = w
+        self.h = h
+        self.free = []
+
+    def get(self, x, y, tile=GROUND):
+        if self.free:
+            p = self.free.pop()
+            p.rect.topleft = (x, y)
+            p.tile = tile
+            return p
+        return Platform(x, y, self.w, self.h, tile)
+
+    def put(self, p):
+        self.free.append(p)
+
+def cell_range(rect, cell_w, cell_h):
+    x0 = rect.left // cell_w
+    x1 = (rect.right - 1) // cell_w
+    y0 = rect.top // cell_h
+    y1 = (rect.bottom - 1) // cell_h
+    for cy in range(y0, y1 + 1):
+        for cx in range(x0, x1 + 1):
+            yield cx, cy
+
+class TileGrid:
+    def __init__(self, cell_w, cell_h):
+        self.cell_w = cell_w
+        self.cell_h = cell_h
+        self.cells = {}
+
+    def add(self, rect):
+        for key in cell_range(rect, self.cell_w, self.cell_h):
+            self.cells.setdefault(key, []).append(rect)
+
+    def remove(self, rect):
+        for key in cell_range(rect, self.cell_w, self.cell_h):
+            cell = self.cells[key]
+            cell.remove(rect)
+            if not cell:
+                del self.cells[key]
+
+    def clear(self):
+        self.cells.clear()
+
+    def query(self, rect):
+        found = []
+        seen = set()
+        for key in cell_range(rect, self.cell_w, self.cell_h):
+            for r in self.cells.get(key, ()):
+                if id(r) not in seen:
+                    seen.add(id(r))
+                    found.append(r)
+        return found
+
+class LevelLayer:
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self, chunk_w, chunk_h):
+        self.chunk_w = chunk_w
+        self.chunk_h = chunk_h
+        self.chunks = {}
+        self.free = []
+
+    def add(self, sprite):
+        for cx, cy in cell_range(sprite.rect, self.chunk_w, self.chunk_h):
+            chunk = self.chunks.get((cx, cy))
+            if chunk is None:
+                if self.free:
+                    chunk = self.free.pop()
+                else:
+                    chunk = pygame.Surface((self.chunk_w, self.chunk_h))
+                    chunk.set_colorkey(self.COLORKEY, pygame.RLEACCEL)
+                chunk.fill(self.COLORKEY)
+                self.chunks[(cx, cy)] = chunk
+            chunk.blit(sprite.image, sprite.rect.move(-cx * self.chunk_w, -cy * self.chunk_h))
+
+    def discard(self, key):
+        # Keep the surface around; the next chunk loaded reuses it.
+        chunk = self.chunks.pop(key, None)
+        if chunk is not None:
+            self.free.append(chunk)
+
+    def clear(self):
+        self.free.extend(self.chunks.values())
+        self.chunks.clear()
+
+    def draw(self, surface, view):
+        for cx, cy in cell_range(view, self.chunk_w, self.chunk_h):
+            chunk = self.chunks.get((cx, cy))
+            if chunk is not None:
+                surface.blit(chunk, (cx * self.chunk_w - view.x, cy * self.chunk_h - view.y))
@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import fcntl
+import io
+import gzip
+import hashlib
+import http.server
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "waybar-wttr.py")
+
+spec = importlib.util.spec_from_file_location("waybar_wttr", SCRIPT)
+wttr = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(wttr)
+
+
+def j1(desc="Sunny"):
+    hour = {"time": "1200", "weatherCode": "116", "FeelsLikeF": "55",
+            "weatherDesc": [{"value": "Partly cloudy"}], "tempC": "13"}
+    hour.update({event: "0" for event in wttr.CHANCES})
+    hour["chanceofrain"] = "30"
+    return {
+        "current_condition": [{"FeelsLikeF": "5", "temp_F": "8", "weatherCode": "113",
+                               "weatherDesc": [{"value": desc}], "windspeedKmph": "7",
+                               "humidity": "40"}],
+        "nearest_area": [{"areaName": [{"value": "Town"}]}],
+        "request": [{"query": "Lat 1 Lon 2", "type": "LatLon"}],
+        "weather": [{"date": "2026-10-18", "maxtempF": "60", "mintempF": "40",
+                     "astronomy": [{"sunrise": "07:00 AM", "sunset": "06:00 PM"}],
+                     "hourly": [hour]}],
+    }
+
+
+class StandIn(http.server.BaseHTTPRequestHandler):
+    # A wttr.in stand-in that validates with ETag/Last-Modified and gzips
+    # when asked to.
+    protocol_version = "HTTP/1.1"
+    body = json.dumps(j1()).encode()
+    last_modified = "Sun, 18 Oct 2026 06:00:00 GMT"
+    fail = False
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.fail:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.md5(self.body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        StandIn.requests = []
+        StandIn.fail = False
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.saved = wttr.WTTR_URL, wttr.CACHE_DIR
+        wttr.WTTR_URL = self.url
+        wttr.CACHE_DIR = os.path.join(self.tmp.name, "waybar-wttr")
+        wttr.sessions.clear()
+
+    def tearDown(self):
+        wttr.WTTR_URL, wttr.CACHE_DIR = self.saved
+        for session in wttr.sessions.values():
+            session.close()
+        wttr.sessions.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_first_fetch_stores_validators(self):
+        wttr.refresh("")
+        cache = wttr.load_cache("")
+        self.assertEqual(cache["etag"], '"%s"' % hashlib.md5(StandIn.body).hexdigest())
+        self.assertEqual(cache["last_modified"], StandIn.last_modified)
+        self.assertEqual(cache["snapshot"]["now"]["desc"], "Sunny")
+        self.assertIn("gzip", StandIn.requests[0]["Accept-Encoding"])
+
+    def test_not_modified_keeps_snapshot_and_bumps_fetched(self):
+        wttr.refresh("")
+        cache = wttr.load_cache("")
+        cache["fetched"] -= 3600
+        with open(wttr.cache_file(""), "w") as f:
+            json.dump(cache, f)
+
+        wttr.refresh("")
+        headers = StandIn.requests[1]
+        self.assertEqual(headers["If-None-Match"], cache["etag"])
+        self.assertEqual(headers["If-Modified-Since"], StandIn.last_modified)
+        self.assertIn("gzip", headers["Accept-Encoding"])
+        refreshed = wttr.load_cache("")
+        self.assertEqual(refreshed["snapshot"], cache["snapshot"])
+        self.assertGreater(refreshed["fetched"], cache["fetched"] + 3000)
+        self.assertFalse(wttr.is_stale(refreshed))
+
+    def test_failed_fetch_keeps_last_good(self):
+        wttr.refresh("")
+        cache = wttr.load_cache("")
+        StandIn.fail = True
+        wttr.refresh("")
+        self.assertEqual(len(StandIn.requests), 2)
+        self.assertEqual(wttr.load_cache(""), cache)
+
+    def run_script(self):
+        env = dict(os.environ, WTTR_URL=self.url, XDG_CACHE_HOME=self.tmp.name)
+        result = subprocess.run([sys.executable, SCRIPT], env=env, capture_output=True,
+                                text=True, timeout=30, check=True)
+        return json.loads(result.stdout)
+
+    def test_script_prints_placeholder_without_cache_or_network(self):
+        StandIn.fail = True
+        self.assertEqual(self.run_script(), wttr.unavailable())
+
+    def test_script_serves_stale_cache_while_upstream_fails(self):
+        wttr.refresh("")
+        cache = wttr.load_cache("")
+        cache["fetched"] -= 3600
+        with open(wttr.cache_file(""), "w") as f:
+            json.dump(cache, f)
+        StandIn.fail = True
+
+        self.assertEqual(self.run_script(), wttr.render(cache["snapshot"]))
+        # The background refresh fails and leaves the last good copy alone.
+        deadline = time.time() + 10
+        while len(StandIn.requests) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        with open(wttr.cache_file("") + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        self.assertEqual(len(StandIn.requests), 2)
+        self.assertEqual(wttr.load_cache(""), cache)
+
+    def ask(self, service, request):
+        path = os.path.join(self.tmp.name, "waybar-wttr.sock")
+
+        async def exchange():
+            server = await asyncio.start_unix_server(service.handle, path)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(json.dumps(request).encode() + b"\n")
+                line = await reader.readline()
+                writer.close()
+                return json.loads(line) if line else None
+
+        return asyncio.run(exchange())
+
+    def test_service_answers_raw(self):
+        service = wttr.WeatherService()
+        reply = self.ask(service, {"locations": [""], "raw": True})
+        self.assertEqual(reply[0]["location"], "")
+        self.assertEqual(reply[0]["weather"]["now"]["desc"], "Sunny")
+
+    def test_service_rejects_bad_locations(self):
+        service = wttr.WeatherService()
+        for locations in ("London", ["x"] * (wttr.MAX_LOCATIONS + 1), [1], {"London": 1}):
+            self.assertIsNone(self.ask(service, {"locations": locations}))
+        self.assertEqual(StandIn.requests, [])
+        self.assertEqual(service.caches, {})
+
+    def test_service_forgets_least_recent_location(self):
+        service = wttr.WeatherService()
+        places = [f"place{i}" for i in range(wttr.SERVICE_LOCATIONS)]
+        for place in places:
+            service.cache(place)
+        service.cache(places[0])
+        service.cache("one more")
+        self.assertEqual(len(service.caches), wttr.SERVICE_LOCATIONS)
+        self.assertIn(places[0], service.caches)
+        self.assertNotIn(places[1], service.caches)
+
+
+class EmitTest(unittest.TestCase):
+    def emitted(self, replies, field=None):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            wttr.emit(replies, field)
+        return out.getvalue()
+
+    def test_field_prints_strings_plain_and_the_rest_as_json(self):
+        reply = {"location": "Town", "fetched": None, "weather": {"now": {"desc": "Sunny"}}}
+        self.assertEqual(self.emitted([reply], "location"), "Town\n")
+        self.assertEqual(json.loads(self.emitted([reply], "weather")), reply["weather"])
+        self.assertEqual(self.emitted([reply], "fetched"), "null\n")
+        self.assertEqual(self.emitted([reply], "missing"), "\n")
+        self.assertEqual(json.loads(self.emitted([reply])), reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
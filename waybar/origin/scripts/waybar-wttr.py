@@ -1,8 +1,35 @@
 #!/usr/bin/env python
 
+import argparse
+import asyncio
+import fcntl
+import html
 import json
-import requests
+import os
+import socket
+import subprocess
+import sys
+import time
 from datetime import datetime
+from urllib.parse import quote
+
+# requests is imported only where a fetch actually happens; answering from
+# the cache or the service is much faster without it.
+
+WTTR_URL = os.environ.get("WTTR_URL", "https://wttr.in/")
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "waybar-wttr")
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or CACHE_DIR, "waybar-wttr.sock")
+CACHE_TTL = 15 * 60
+RETRY_INTERVAL = 60
+FETCH_TIMEOUT = 10
+CLIENT_TIMEOUT = FETCH_TIMEOUT + 5
+# Locations per service request, and locations the service keeps state for.
+MAX_LOCATIONS = 8
+SERVICE_LOCATIONS = 32
+
+# One keep-alive session per location for the daemon's repeated refreshes.
+# A location is only ever refreshed by one thread at a time.
+sessions = {}
 
 WEATHER_CODES = {
     '113': '☀️ ',
@@ -55,65 +82,463 @@ WEATHER_CODES = {
     '395': '❄️ '
 }
 
-data = {}
-
-
-weather = requests.get("https://wttr.in/?format=j1").json()
-
 
 def format_time(time):
     return time.replace("00", "").zfill(2)
 
 
 def format_temp(temp):
-    return (hour['FeelsLikeF']+"°").ljust(3)
-
-
-def format_chances(hour):
-    chances = {
-        "chanceoffog": "Fog",
-        "chanceoffrost": "Frost",
-        "chanceofovercast": "Overcast",
-        "chanceofrain": "Rain",
-        "chanceofsnow": "Snow",
-        "chanceofsunshine": "Sunshine",
-        "chanceofthunder": "Thunder",
-        "chanceofwindy": "Wind"
-    }
+    return (temp+"°").ljust(3)
+
+
+CHANCES = {
+    "chanceoffog": "Fog",
+    "chanceoffrost": "Frost",
+    "chanceofovercast": "Overcast",
+    "chanceofrain": "Rain",
+    "chanceofsnow": "Snow",
+    "chanceofsunshine": "Sunshine",
+    "chanceofthunder": "Thunder",
+    "chanceofwindy": "Wind"
+}
 
+# Every key the snapshot reads from a j1 response; the rest of the document
+# (nearest_area, request, most hourly fields) is dropped while decoding.
+J1_FIELDS = {
+    'current_condition', 'weather', 'weatherCode', 'weatherDesc', 'value',
+    'temp_F', 'FeelsLikeF', 'windspeedKmph', 'humidity', 'date', 'maxtempF',
+    'mintempF', 'astronomy', 'sunrise', 'sunset', 'hourly', 'time',
+    *CHANCES,
+}
+
+
+def format_chances(chances):
     conditions = []
-    for event in chances.keys():
-        if int(hour[event]) > 0:
-            conditions.append(chances[event]+" "+hour[event]+"%")
+    for event in CHANCES.keys():
+        if event in chances:
+            conditions.append(CHANCES[event]+" "+chances[event]+"%")
     return ", ".join(conditions)
 
-tempint = int(weather['current_condition'][0]['FeelsLikeF'])
-extrachar = ''
-if tempint > 0 and tempint < 10:
-    extrachar = '+'
-
-
-data['text'] = ' '+WEATHER_CODES[weather['current_condition'][0]['weatherCode']] + \
-    " "+extrachar+weather['current_condition'][0]['FeelsLikeF']+"°"
-
-data['tooltip'] = f"<b>{weather['current_condition'][0]['weatherDesc'][0]['value']} {weather['current_condition'][0]['temp_F']}°</b>\n"
-data['tooltip'] += f"Feels like: {weather['current_condition'][0]['FeelsLikeF']}°\n"
-data['tooltip'] += f"Wind: {weather['current_condition'][0]['windspeedKmph']}Km/h\n"
-data['tooltip'] += f"Humidity: {weather['current_condition'][0]['humidity']}%\n"
-for i, day in enumerate(weather['weather']):
-    data['tooltip'] += f"\n<b>"
-    if i == 0:
-        data['tooltip'] += "Today, "
-    if i == 1:
-        data['tooltip'] += "Tomorrow, "
-    data['tooltip'] += f"{day['date']}</b>\n"
-    data['tooltip'] += f"⬆️ {day['maxtempF']}° ⬇️ {day['mintempF']}° "
-    data['tooltip'] += f"🌅 {day['astronomy'][0]['sunrise']} 🌇 {day['astronomy'][0]['sunset']}\n"
-    for hour in day['hourly']:
+
+def parse(body):
+    return json.loads(body, object_pairs_hook=lambda pairs: {k: v for k, v in pairs if k in J1_FIELDS})
+
+
+def snapshot(weather):
+    # The compact form kept in the cache: just what render() shows.
+    current = weather['current_condition'][0]
+    return {
+        "now": {
+            "code": current['weatherCode'],
+            "desc": current['weatherDesc'][0]['value'],
+            "temp": current['temp_F'],
+            "feels": current['FeelsLikeF'],
+            "wind": current['windspeedKmph'],
+            "humidity": current['humidity'],
+        },
+        "days": [{
+            "date": day['date'],
+            "max": day['maxtempF'],
+            "min": day['mintempF'],
+            "sunrise": day['astronomy'][0]['sunrise'],
+            "sunset": day['astronomy'][0]['sunset'],
+            "hours": [{
+                "time": format_time(hour['time']),
+                "code": hour['weatherCode'],
+                "feels": hour['FeelsLikeF'],
+                "desc": hour['weatherDesc'][0]['value'],
+                "chances": {event: hour[event] for event in CHANCES if int(hour[event]) > 0},
+            } for hour in day['hourly']],
+        } for day in weather['weather']],
+    }
+
+
+def render(weather):
+    data = {}
+    current = weather['now']
+
+    tempint = int(current['feels'])
+    extrachar = ''
+    if tempint > 0 and tempint < 10:
+        extrachar = '+'
+
+    data['text'] = ' '+WEATHER_CODES[current['code']] + \
+        " "+extrachar+current['feels']+"°"
+
+    data['tooltip'] = f"<b>{current['desc']} {current['temp']}°</b>\n"
+    data['tooltip'] += f"Feels like: {current['feels']}°\n"
+    data['tooltip'] += f"Wind: {current['wind']}Km/h\n"
+    data['tooltip'] += f"Humidity: {current['humidity']}%\n"
+    for i, day in enumerate(weather['days']):
+        data['tooltip'] += f"\n<b>"
         if i == 0:
-            if int(format_time(hour['time'])) < datetime.now().hour-2:
+            data['tooltip'] += "Today, "
+        if i == 1:
+            data['tooltip'] += "Tomorrow, "
+        data['tooltip'] += f"{day['date']}</b>\n"
+        data['tooltip'] += f"⬆️ {day['max']}° ⬇️ {day['min']}° "
+        data['tooltip'] += f"🌅 {day['sunrise']} 🌇 {day['sunset']}\n"
+        for hour in day['hours']:
+            if i == 0:
+                if int(hour['time']) < datetime.now().hour-2:
+                    continue
+            data['tooltip'] += f"{hour['time']} {WEATHER_CODES[hour['code']]} {format_temp(hour['feels'])} {hour['desc']}, {format_chances(hour['chances'])}\n"
+    return data
+
+
+def cache_file(location):
+    # The empty location is wttr.in's own guess from the client address.
+    if not location:
+        return os.path.join(CACHE_DIR, "weather.json")
+    return os.path.join(CACHE_DIR, f"weather-{quote(location, safe='')}.json")
+
+
+def session_for(location):
+    session = sessions.get(location)
+    if session is None:
+        import requests
+        session = requests.Session()
+        session.headers["Accept-Encoding"] = "gzip"
+        sessions[location] = session
+    return session
+
+
+def load_cache(location):
+    try:
+        with open(cache_file(location)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Caches from before snapshots stored the raw response; refetch those.
+    if not isinstance(cache, dict) or "fetched" not in cache or "snapshot" not in cache:
+        return None
+    return cache
+
+
+def save_cache(location, weather, etag=None, last_modified=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_file(location)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fetched": time.time(), "snapshot": weather,
+                   "etag": etag, "last_modified": last_modified}, f)
+    # Readers never see a half-written cache.
+    os.replace(tmp, path)
+
+
+def is_stale(cache):
+    return cache is None or time.time() - cache['fetched'] > CACHE_TTL
+
+
+def fetch(location, cache=None):
+    # Revalidate what we already have so an unchanged forecast costs a 304
+    # instead of the whole payload.
+    headers = {}
+    if cache is not None:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    url = WTTR_URL + quote(location) + "?format=j1"
+    response = session_for(location).get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    if response.status_code == 304 and cache is not None:
+        save_cache(location, cache["snapshot"], cache.get("etag"), cache.get("last_modified"))
+        return cache["snapshot"]
+    response.raise_for_status()
+    weather = snapshot(parse(response.content))
+    # Make sure the payload renders before it replaces the last good one.
+    render(weather)
+    save_cache(location, weather, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return weather
+
+
+def refresh(location, wait=False):
+    # Only one refresh per location at a time, however often the bar polls.
+    # With wait, block until a refresh already in flight has finished.
+    import requests
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_file(location) + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+        cache = load_cache(location)
+        if wait and not is_stale(cache):
+            return
+        try:
+            fetch(location, cache)
+        except (requests.RequestException, ValueError, KeyError, IndexError):
+            pass
+
+
+async def refresh_all(locations, wait=False):
+    # Every location fetches on its own thread, so a refresh takes as long
+    # as the slowest location and one failing location cannot hold up the
+    # others.
+    await asyncio.gather(*(asyncio.to_thread(refresh, location, wait) for location in locations))
+
+
+def refresh_in_background(locations):
+    args = [sys.executable, os.path.abspath(__file__), "--refresh"]
+    for location in locations:
+        args += ["--location", location]
+    subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def unavailable():
+    return {"text": " ?", "tooltip": "Weather unavailable"}
+
+
+def render_cache(cache):
+    if cache is None:
+        return unavailable()
+    try:
+        return render(cache['snapshot'])
+    except (KeyError, IndexError, ValueError):
+        return unavailable()
+
+
+def combine(locations, outputs):
+    if len(outputs) == 1:
+        return outputs[0]
+    # Both text and tooltip are Pango markup.
+    labels = [html.escape(location or "Here", quote=False) for location in locations]
+    return {
+        "text": " | ".join(f"{label}{data['text']}" for label, data in zip(labels, outputs)),
+        "tooltip": "\n\n".join(f"<big>{label}</big>\n{data['tooltip']}"
+                                for label, data in zip(labels, outputs)),
+    }
+
+
+def next_wakeup(caches):
+    # The tooltip drops hours that are long gone, so re-render on the hour
+    # even when the data itself is still fresh.
+    now = datetime.now()
+    wait = 3600 - now.minute * 60 - now.second
+    for cache in caches:
+        if cache is None:
+            wait = min(wait, RETRY_INTERVAL)
+            continue
+        due = cache['fetched'] + CACHE_TTL - time.time()
+        wait = min(wait, due if due > 0 else RETRY_INTERVAL)
+    return max(1, wait)
+
+
+def daemon(locations):
+    # waybar's continuous exec: one JSON line whenever the module changes.
+    # Every line replaces the module, so one process only ever feeds one
+    # module; per-location modules each run their own --location.
+    last = None
+    while True:
+        caches = [load_cache(location) for location in locations]
+        stale = [location for location, cache in zip(locations, caches) if is_stale(cache)]
+        if stale:
+            asyncio.run(refresh_all(stale))
+            caches = [load_cache(location) or cache for location, cache in zip(locations, caches)]
+        data = combine(locations, [render_cache(cache) for cache in caches])
+        if data != last:
+            print(json.dumps(data), flush=True)
+            last = data
+        time.sleep(next_wakeup(caches))
+
+
+def raw_for(locations, caches):
+    return [{"location": location,
+             "fetched": cache["fetched"] if cache else None,
+             "weather": cache["snapshot"] if cache else None}
+            for location, cache in zip(locations, caches)]
+
+
+class WeatherService:
+    # Owns the fetch and cache cycle for every consumer on the machine, so
+    # they share one upstream request per location and TTL.
+    def __init__(self):
+        self.caches = {}
+        self.rendered = {}
+        self.refreshing = {}
+        self.failed = {}
+
+    def cache(self, location):
+        if location in self.caches:
+            # Keep caches in least recently asked order.
+            self.caches[location] = self.caches.pop(location)
+        else:
+            if len(self.caches) >= SERVICE_LOCATIONS:
+                oldest = next((known for known in self.caches if known not in self.refreshing), None)
+                if oldest is not None:
+                    self.forget(oldest)
+            self.caches[location] = load_cache(location)
+        return self.caches[location]
+
+    def forget(self, location):
+        for table in (self.caches, self.rendered, self.failed):
+            table.pop(location, None)
+        session = sessions.pop(location, None)
+        if session is not None:
+            session.close()
+
+    def refreshed(self, location):
+        # Concurrent queries for the same location share one refresh.
+        task = self.refreshing.get(location)
+        if task is None:
+            task = asyncio.create_task(self.refresh(location))
+            self.refreshing[location] = task
+        return task
+
+    async def refresh(self, location):
+        try:
+            await asyncio.to_thread(refresh, location, True)
+            cache = load_cache(location)
+            if cache is not None:
+                self.caches[location] = cache
+            if is_stale(self.caches.get(location)):
+                self.failed[location] = time.time()
+            else:
+                self.failed.pop(location, None)
+        finally:
+            del self.refreshing[location]
+
+    async def lookup(self, locations):
+        # Locations never fetched are waited for, unless they failed just
+        # now; stale ones are answered as they are and refreshed afterwards.
+        waiting = []
+        for location in locations:
+            cache = self.cache(location)
+            if not is_stale(cache):
+                continue
+            if time.time() - self.failed.get(location, 0) < RETRY_INTERVAL:
                 continue
-        data['tooltip'] += f"{format_time(hour['time'])} {WEATHER_CODES[hour['weatherCode']]} {format_temp(hour['FeelsLikeF'])} {hour['weatherDesc'][0]['value']}, {format_chances(hour)}\n"
+            task = self.refreshed(location)
+            if cache is None:
+                waiting.append(task)
+        if waiting:
+            await asyncio.gather(*waiting)
+        return [self.cache(location) for location in locations]
+
+    def render(self, location, cache):
+        # Rendering depends on the data and on the hour, nothing else.
+        key = (cache["fetched"] if cache else None, datetime.now().hour)
+        hit = self.rendered.get(location)
+        if hit is None or hit[0] != key:
+            hit = (key, render_cache(cache))
+            self.rendered[location] = hit
+        return hit[1]
+
+    async def handle(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            locations = request.get("locations") or [""]
+            if (not isinstance(locations, list) or len(locations) > MAX_LOCATIONS
+                    or not all(isinstance(location, str) for location in locations)):
+                raise ValueError(f"bad locations: {locations!r}")
+            caches = await self.lookup(locations)
+            if request.get("raw"):
+                reply = raw_for(locations, caches)
+            else:
+                outputs = [self.render(location, cache) for location, cache in zip(locations, caches)]
+                reply = [combine(locations, outputs)]
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        except (ValueError, AttributeError, TypeError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve():
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        if sock.connect_ex(SOCKET_PATH) == 0:
+            sys.exit(f"already serving on {SOCKET_PATH}")
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    try:
+        os.unlink(SOCKET_PATH)
+    except FileNotFoundError:
+        pass
+    server = await asyncio.start_unix_server(WeatherService().handle, SOCKET_PATH)
+    os.chmod(SOCKET_PATH, 0o600)
+    async with server:
+        await server.serve_forever()
+
+
+def query(request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CLIENT_TIMEOUT)
+        sock.connect(SOCKET_PATH)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def emit(replies, field=None):
+    for reply in replies:
+        if field is not None:
+            value = reply.get(field, "")
+            print(value if isinstance(value, str) else json.dumps(value))
+        else:
+            print(json.dumps(reply))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wttr.in weather for waybar")
+    parser.add_argument("--location", action="append", metavar="NAME",
+                        help="wttr.in location, may be repeated to show several in one module "
+                             "(default: wttr.in's guess)")
+    parser.add_argument("--daemon", action="store_true", help="stay running and print a line on every change")
+    parser.add_argument("--refresh", action="store_true", help="update the cache and exit")
+    parser.add_argument("--serve", action="store_true", help=f"answer queries on {SOCKET_PATH}")
+    parser.add_argument("--client", action="store_true",
+                        help="ask the running service, falling back to the cache when there is none")
+    parser.add_argument("--raw", action="store_true", help="print the cached weather fields instead of the module")
+    parser.add_argument("--field", metavar="NAME", help="print only this field of each output as plain text")
+    args = parser.parse_args()
+    locations = args.location or [""]
+
+    if args.serve:
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.client:
+        try:
+            emit(query({"locations": locations, "raw": args.raw}), args.field)
+            return
+        except (OSError, ValueError):
+            pass
+
+    if args.refresh:
+        asyncio.run(refresh_all(locations))
+        return
+
+    if args.daemon:
+        try:
+            daemon(locations)
+        except (BrokenPipeError, KeyboardInterrupt):
+            # waybar went away; keep the interpreter from complaining about
+            # the closed pipe on exit.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+
+    # Serve whatever is cached straight away and refresh stale data after
+    # the bar already has its output. Only locations never fetched before
+    # are waited for.
+    caches = [load_cache(location) for location in locations]
+    missing = [location for location, cache in zip(locations, caches) if cache is None]
+    if missing:
+        asyncio.run(refresh_all(missing, wait=True))
+        caches = [load_cache(location) for location in locations]
+
+    if args.raw:
+        emit(raw_for(locations, caches), args.field)
+    else:
+        emit([combine(locations, [render_cache(cache) for cache in caches])], args.field)
+    sys.stdout.flush()
+    stale = [location for location, cache in zip(locations, caches) if cache is not None and is_stale(cache)]
+    if stale:
+        refresh_in_background(stale)
 
 
-print(json.dumps(data))
+if __name__ == "__main__":
+    main()